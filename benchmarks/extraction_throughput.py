@@ -0,0 +1,67 @@
+# benchmarks/extraction_throughput.py
+"""
+Measure text extraction throughput per document format.
+
+Every file under the given paths is run through the extractor registry and
+timings are grouped by extractor.
+
+Usage:
+    python benchmarks/extraction_throughput.py PATH [PATH ...] [--limit N]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.text_extraction import find_extractor, iter_text
+
+
+def _iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--limit", type=int, default=0, help="max files per format")
+    args = parser.parse_args()
+
+    stats = defaultdict(lambda: {"files": 0, "bytes": 0, "chunks": 0, "chars": 0, "seconds": 0.0})
+    for path in _iter_files(args.paths):
+        extractor = find_extractor(path)
+        if extractor is None:
+            continue
+        s = stats[extractor.name]
+        if args.limit and s["files"] >= args.limit:
+            continue
+
+        start = time.perf_counter()
+        for chunk in iter_text(path):
+            s["chunks"] += 1
+            s["chars"] += len(chunk)
+        s["seconds"] += time.perf_counter() - start
+        s["files"] += 1
+        s["bytes"] += os.path.getsize(path)
+
+    print(f"{'extractor':<20}{'files':>8}{'MB':>10}{'chunks':>10}{'MB/s':>10}{'files/s':>10}")
+    for name, s in sorted(stats.items()):
+        mb = s["bytes"] / (1024 * 1024)
+        secs = s["seconds"] or 1e-9
+        print(
+            f"{name:<20}{s['files']:>8}{mb:>10.2f}{s['chunks']:>10}"
+            f"{mb / secs:>10.2f}{s['files'] / secs:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
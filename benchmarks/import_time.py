@@ -0,0 +1,129 @@
+# benchmarks/import_time.py
+"""
+Profile module import times and check the query path's startup budget.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and
+the slowest imports it pulls in are listed. The query path (importing the
+search modules, then running a first query against a small index, which
+loads RAKE) must stay within ``--budget-ms`` and must not import any
+extraction library; the exit status is 1 if it does.
+
+Usage:
+    python benchmarks/import_time.py [MODULE ...] [--top N] [--budget-ms MS]
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["core.search_engine", "core.processor", "gui.main_window"]
+
+# Everything a search needs before the first query is typed
+QUERY_PATH = ["core.index_manager", "core.compact_index", "core.search_engine"]
+
+# Libraries only indexing should load (queries need NLTK/RAKE for parsing)
+HEAVY_MODULES = ["fitz", "docx", "pytesseract", "PIL"]
+
+# A first query: RAKE and the normalizer are loaded on first use
+FIRST_QUERY = (
+    "from core.compact_index import CompactIndex\n"
+    "from core.search_engine import search_results\n"
+    "index = CompactIndex.from_dict(\n"
+    "    {'/docs/a.txt': ['neural', 'network'], '/docs/b.txt': ['train']}\n"
+    ")\n"
+    "search_results('neural networks training', index)\n"
+)
+
+
+def profile_imports(modules):
+    """
+    Import ``modules`` in a fresh interpreter.
+
+    Returns ``(total microseconds, [(cumulative us, self us, name)], loaded
+    module names)``, the list sorted slowest first.
+    """
+    code = (
+        "import sys\n"
+        f"for m in {modules!r}: __import__(m)\n"
+        "print('\\n'.join(sys.modules))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        indent = len(name) - len(name.lstrip())
+        timings.append((int(cumulative_us), int(self_us), name.strip(), indent))
+    # Top-level imports are the least indented ones; their sum is the total
+    top_level = min((t[3] for t in timings), default=0)
+    total = sum(t[0] for t in timings if t[3] == top_level)
+    timings = sorted(((c, s, n) for c, s, n, _ in timings), reverse=True)
+    return total, timings, set(proc.stdout.split())
+
+
+def time_query_path(modules):
+    """
+    Import ``modules`` and run ``FIRST_QUERY`` in a fresh interpreter.
+
+    Returns ``(import ms, first query ms, loaded module names)``.
+    """
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"for m in {modules!r}: __import__(m)\n"
+        "imported = time.perf_counter()\n"
+        f"{FIRST_QUERY}"
+        "done = time.perf_counter()\n"
+        "print((imported - started) * 1000, (done - imported) * 1000)\n"
+        "print('\\n'.join(sys.modules))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timing, *loaded = proc.stdout.splitlines()
+    import_ms, query_ms = map(float, timing.split())
+    return import_ms, query_ms, set(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="query path budget")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        total, timings, _ = profile_imports([module])
+        print(f"{module}: {total / 1000:.1f} ms")
+        print(f"  {'cumulative ms':>14}{'self ms':>10}  module")
+        for cumulative, own, name in timings[: args.top]:
+            print(f"  {cumulative / 1000:>14.1f}{own / 1000:>10.1f}  {name}")
+        print()
+
+    import_ms, query_ms, loaded = time_query_path(QUERY_PATH)
+    heavy = sorted(m for m in HEAVY_MODULES if m in loaded)
+    total_ms = import_ms + query_ms
+    print(
+        f"Query path: {total_ms:.1f} ms (imports {import_ms:.1f} ms, first query "
+        f"{query_ms:.1f} ms; budget {args.budget_ms:.0f} ms)"
+    )
+    ok = total_ms <= args.budget_ms
+    if not ok:
+        print("  over budget")
+    if heavy:
+        print(f"  loads indexing-only modules: {', '.join(heavy)}")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
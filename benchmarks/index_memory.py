@@ -0,0 +1,38 @@
+# benchmarks/index_memory.py
+"""
+Compare the memory footprint of the plain ``{path: [keywords]}`` index
+with the CompactIndex built from the same corpus.
+
+Usage:
+    python benchmarks/index_memory.py [output.json]
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.compact_index import memory_report
+from core.config import load_config
+from core.index_manager import load_index
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.2f} MB"
+
+
+def main():
+    output_file = sys.argv[1] if len(sys.argv) > 1 else load_config()["OUTPUT_FILE"]
+    report = memory_report(load_index(output_file)["documents"])
+
+    print(f"Index file:    {output_file}")
+    print(f"Documents:     {report['documents']}")
+    print(f"Unique terms:  {report['terms']}")
+    print(f"Directories:   {report['directories']}")
+    print(f"Postings:      {report['postings']}")
+    print(f"dict index:    {_mb(report['dict_bytes'])}")
+    print(f"CompactIndex:  {_mb(report['compact_bytes'])}")
+    print(f"Ratio:         {report['ratio']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
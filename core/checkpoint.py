@@ -0,0 +1,165 @@
+# core/checkpoint.py
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from core.keyword_extraction import merge_forms
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+META_FILE = "meta.json"
+JOURNAL_FILE = "journal.jsonl"
+
+
+def run_fingerprint(paths, settings):
+    """Identify an indexing run by its input paths and settings."""
+    h = hashlib.sha256()
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for path in paths:
+        h.update(path.encode("utf-8", errors="surrogateescape"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class Checkpoint:
+    """
+    Append-only journal of finished indexing work.
+
+    ``meta.json`` holds the run fingerprint and the duplicate map computed
+    up front. ``journal.jsonl`` gets one fsynced line per finished unit of
+    work (keywords, page hits and pending OCR jobs of a chunk of files) and
+    one per finished OCR document. A run with the same fingerprint replays
+    the journal and only redoes the rest. A torn last line from a crash is
+    ignored, so that unit is simply redone.
+    """
+
+    def __init__(self, checkpoint_dir, fingerprint, on_document=None):
+        self.dir = Path(checkpoint_dir)
+        self.fingerprint = fingerprint
+        self._journal = None
+        # Called as on_document(path, keywords, pages) for every replayed
+        # document instead of collecting them in ``documents``/``pages``.
+        self.on_document = on_document
+
+        self.duplicates = {}
+        self.done_units = set()
+        self.documents = {}
+        self.document_count = 0
+        self.pages = {}
+        self.ocr_jobs = {}  # path -> scanned page indexes, not yet OCRed
+        self.forms = {}  # term -> {original word: documents}, see merge_forms
+
+    def resume(self):
+        """Load a matching checkpoint; return True if there was one to resume."""
+        meta_path = self.dir / META_FILE
+        if not meta_path.exists():
+            return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {meta_path}: {e}")
+            return False
+        if meta.get("fingerprint") != self.fingerprint:
+            logger.info("Checkpoint belongs to a different run; starting over")
+            return False
+
+        self.duplicates = meta.get("duplicates", {})
+        journal_path = self.dir / JOURNAL_FILE
+        if journal_path.exists():
+            valid = 0
+            with open(journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn write at the end of the journal
+                    self._apply(entry)
+                    valid += len(line)
+            # Drop a torn tail so new entries start on a clean line
+            os.truncate(journal_path, valid)
+        logger.info(
+            f"Resuming from checkpoint: {len(self.done_units)} unit(s), "
+            f"{self.document_count} document(s) already indexed"
+        )
+        return True
+
+    def start(self, duplicates):
+        """Begin a fresh run, discarding any previous checkpoint."""
+        self.clear()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.duplicates = duplicates
+        tmp = self.dir / (META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "duplicates": duplicates}, f)
+        os.replace(tmp, self.dir / META_FILE)
+
+    def _add_document(self, path, keywords, pages):
+        self.document_count += 1
+        if self.on_document is not None:
+            self.on_document(path, keywords, pages)
+            return
+        self.documents[path] = keywords
+        if pages:
+            self.pages[path] = pages
+
+    def _apply(self, entry):
+        if "unit" in entry:
+            self.done_units.add(entry["unit"])
+            pages = entry["pages"]
+            for path, keywords in entry["documents"].items():
+                self._add_document(path, keywords, pages.get(path))
+            for path, scanned in entry["ocr_jobs"]:
+                self.ocr_jobs[path] = scanned
+            merge_forms(self.forms, entry.get("forms", {}))
+        elif "ocr" in entry:
+            path = entry["ocr"]
+            self.ocr_jobs.pop(path, None)
+            if entry["keywords"]:
+                self._add_document(path, entry["keywords"], entry["pages"])
+                merge_forms(self.forms, entry.get("forms", {}))
+
+    def _write(self, entry):
+        if self._journal is None:
+            self._journal = open(self.dir / JOURNAL_FILE, "a", encoding="utf-8")
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def record_unit(self, name, documents, pages, ocr_jobs, forms=None):
+        self._write(
+            {
+                "unit": name,
+                "documents": documents,
+                "pages": pages,
+                "ocr_jobs": ocr_jobs,
+                "forms": forms or {},
+            }
+        )
+
+    def record_ocr(self, path, keywords, pages, forms=None):
+        self._write({"ocr": path, "keywords": keywords, "pages": pages, "forms": forms or {}})
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def clear(self):
+        self.close()
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
+
+
+def clear_checkpoint(checkpoint_dir):
+    """Remove a finished run's checkpoint."""
+    checkpoint_dir = Path(checkpoint_dir)
+    if checkpoint_dir.exists():
+        shutil.rmtree(checkpoint_dir)
+
+
+def has_checkpoint(checkpoint_dir):
+    return (Path(checkpoint_dir) / META_FILE).exists()
@@ -0,0 +1,236 @@
+# core/compact_index.py
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+
+_PATH_PARTS = re.compile(r"(?<=[\\/])")
+
+
+class CompactIndex:
+    """
+    Memory-compact inverted index.
+
+    Keywords live once in an interned term table, documents are integer ids
+    whose paths are stored as a directory tree of shared prefixes, and each
+    term maps to an array of document ids instead of a list of strings.
+    """
+
+    def __init__(self):
+        self.terms = []  # term id -> interned term
+        self.term_ids = {}  # term -> term id
+        self.postings = []  # term id -> array("I") of doc ids
+
+        self.dir_names = []  # dir id -> path segment, including trailing separator
+        self.dir_parents = array("i")  # dir id -> parent dir id (-1 for roots)
+        self._dir_ids = {}  # (parent id, segment) -> dir id
+
+        self.doc_dirs = array("i")  # doc id -> dir id (-1 if no directory)
+        self.doc_names = []  # doc id -> file name
+
+        # doc id -> (sorted term ids, start of each term's pages, pages), all
+        # array("I"), only for documents indexed page by page. A term's
+        # pages are pages[starts[i]:starts[i + 1]] for term_ids[i] == term.
+        self.doc_pages = {}
+
+        # doc id -> other paths with identical content
+        self.doc_duplicates = {}
+
+        # Published index generation this was loaded from, and its text store
+        self.generation = 0
+        self.text_store_dir = None
+
+    @classmethod
+    def from_dict(cls, data, pages=None, duplicates=None):
+        """
+        Build a compact index from the ``{path: [keywords]}`` mapping, the
+        optional ``{path: {keyword: [pages]}}`` page hits and the optional
+        ``{path: [identical copies]}`` duplicates.
+        """
+        index = cls()
+        pages = pages or {}
+        duplicates = duplicates or {}
+        for path, keywords in data.items():
+            index.add_document(path, keywords, pages.get(path), duplicates.get(path))
+        return index
+
+    def __len__(self):
+        return len(self.doc_names)
+
+    def __bool__(self):
+        return bool(self.doc_names)
+
+    def add_document(self, path, keywords, term_pages=None, duplicates=None):
+        doc_id = len(self.doc_names)
+        *dirs, name = _PATH_PARTS.split(path)
+
+        dir_id = -1
+        for segment in dirs:
+            key = (dir_id, segment)
+            next_id = self._dir_ids.get(key)
+            if next_id is None:
+                next_id = len(self.dir_names)
+                self._dir_ids[key] = next_id
+                self.dir_names.append(sys.intern(segment))
+                self.dir_parents.append(dir_id)
+            dir_id = next_id
+
+        self.doc_dirs.append(dir_id)
+        self.doc_names.append(name)
+
+        for term in set(keywords):
+            self.postings[self._intern_term(term)].append(doc_id)
+
+        self.set_pages(doc_id, term_pages)
+        self.set_duplicates(doc_id, duplicates)
+        return doc_id
+
+    def set_pages(self, doc_id, term_pages):
+        """Attach ``{term: [pages]}`` hits to an already added document."""
+        if term_pages:
+            self.doc_pages[doc_id] = self._pack_pages(term_pages)
+
+    def set_duplicates(self, doc_id, duplicates):
+        """Record other paths with the same content as an added document."""
+        if duplicates:
+            self.doc_duplicates[doc_id] = list(duplicates)
+
+    def _pack_pages(self, term_pages):
+        by_term = sorted(
+            ((self._intern_term(term), pages) for term, pages in term_pages.items()),
+            key=itemgetter(0),
+        )
+        term_ids, starts, pages = array("I"), array("I", [0]), array("I")
+        for term_id, term_page_list in by_term:
+            term_ids.append(term_id)
+            pages.extend(term_page_list)
+            starts.append(len(pages))
+        return term_ids, starts, pages
+
+    def add_postings(self, term, doc_ids):
+        """Append already-numbered documents to ``term``'s posting array."""
+        self.postings[self._intern_term(term)].extend(doc_ids)
+
+    def _intern_term(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term = sys.intern(term)
+            term_id = len(self.terms)
+            self.term_ids[term] = term_id
+            self.terms.append(term)
+            self.postings.append(array("I"))
+        return term_id
+
+    def path(self, doc_id):
+        parts = [self.doc_names[doc_id]]
+        dir_id = self.doc_dirs[doc_id]
+        while dir_id != -1:
+            parts.append(self.dir_names[dir_id])
+            dir_id = self.dir_parents[dir_id]
+        return "".join(reversed(parts))
+
+    def duplicates(self, doc_id):
+        """Other paths with the same content as ``doc_id``."""
+        return self.doc_duplicates.get(doc_id, [])
+
+    def doc_ids(self, term):
+        """Return the posting array for ``term`` (empty if unknown)."""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return ()
+        return self.postings[term_id]
+
+    def term_pages(self, doc_id):
+        """``{term: [pages]}`` of a document, or None if it has no page data."""
+        entry = self.doc_pages.get(doc_id)
+        if not entry:
+            return None
+        term_ids, starts, pages = entry
+        return {
+            self.terms[term_id]: list(pages[starts[i] : starts[i + 1]])
+            for i, term_id in enumerate(term_ids)
+        }
+
+    def page_scores(self, doc_id, weighted_terms):
+        """
+        Score the pages of a document for ``[(term, weight), ...]``.
+
+        Returns ``{page: summed weight}``; empty if the document has no page
+        data. Each query term is found by binary search, so the cost does
+        not grow with the size of the document.
+        """
+        entry = self.doc_pages.get(doc_id)
+        if not entry:
+            return {}
+        term_ids, starts, pages = entry
+        weights = {}
+        for term, weight in weighted_terms:
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            i = bisect_left(term_ids, term_id)
+            if i < len(term_ids) and term_ids[i] == term_id:
+                weights[i] = max(weight, weights.get(i, 0))
+        scores = {}
+        for i, weight in weights.items():
+            for page in pages[starts[i] : starts[i + 1]]:
+                scores[page] = scores.get(page, 0) + weight
+        return scores
+
+    def document_frequencies(self):
+        """Return ``{term: number of documents containing it}``."""
+        return {term: len(docs) for term, docs in zip(self.terms, self.postings)}
+
+    def to_dict(self):
+        """Rebuild the ``{path: [keywords]}`` mapping (e.g. for saving)."""
+        keywords = [[] for _ in range(len(self))]
+        for term, docs in zip(self.terms, self.postings):
+            for doc_id in docs:
+                keywords[doc_id].append(term)
+        return {self.path(doc_id): kws for doc_id, kws in enumerate(keywords)}
+
+    def memory_usage(self):
+        """Approximate bytes held by the index structures."""
+        seen = set()
+        total = _sizeof(self.terms, seen) + _sizeof(self.term_ids, seen)
+        total += _sizeof(self.postings, seen)
+        total += _sizeof(self.dir_names, seen) + _sizeof(self.dir_parents, seen)
+        total += _sizeof(self._dir_ids, seen)
+        total += _sizeof(self.doc_dirs, seen) + _sizeof(self.doc_names, seen)
+        total += _sizeof(self.doc_pages, seen) + _sizeof(self.doc_duplicates, seen)
+        return total
+
+
+def _sizeof(obj, seen):
+    """Deep ``sys.getsizeof`` that counts each shared object once."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _sizeof(k, seen) + _sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += _sizeof(item, seen)
+    return size
+
+
+def memory_report(data):
+    """
+    Compare the memory held by a ``{path: [keywords]}`` dict with the
+    CompactIndex built from it.
+    """
+    dict_bytes = _sizeof(data, set())
+    index = CompactIndex.from_dict(data)
+    compact_bytes = index.memory_usage()
+    return {
+        "documents": len(index),
+        "terms": len(index.terms),
+        "directories": len(index.dir_names),
+        "postings": sum(len(p) for p in index.postings),
+        "dict_bytes": dict_bytes,
+        "compact_bytes": compact_bytes,
+        "ratio": compact_bytes / dict_bytes if dict_bytes else 0.0,
+    }
@@ -8,10 +8,42 @@ DEFAULT_CONFIG = {
     "NUM_PROCESSES": 8,
     "TOP_KEYWORDS": 150,
     "AUTOCOMPLETE_WORDS": 100,
-    "SUPPORTED_FORMATS": [".pdf", ".docx"],
+    "SUPPORTED_FORMATS": [
+        ".pdf", ".docx", ".txt", ".md", ".html", ".htm",
+        ".pptx", ".xlsx", ".odt", ".epub",
+    ],
     "INDEX_FOLDER": "all",
     "OUTPUT_FILE": "output.json",
     "AUTOCOMPLETE_FILE": "autocomplete_words.json",
+    "UNICODE_FOLD": True,
+    "STEMMER": "porter",
+    "EXTRA_STOPWORDS": [],
+    "KEEP_STOPWORDS": [],
+    "FUZZY_MAX_DISTANCE": 1,
+    "FUZZY_PENALTY": 0.5,
+    "SEARCH_SHARDS": 0,
+    "SEARCH_SHARD_TIMEOUT": 10,
+    "LIVE_SEARCH_DELAY_MS": 300,
+    "RESULTS_PAGE_SIZE": 200,
+    "SLOW_QUERY_MS": 500,
+    "QUERY_STATS_SIZE": 1000,
+    "QUERY_STATS_FILE": "query_stats.json",
+    "STORE_TEXT": True,
+    "TEXT_STORE_DIR": "text_store",
+    "SNIPPET_CHARS": 240,
+    "PAGE_LEVEL_INDEX": True,
+    "PAGE_TOP_KEYWORDS": 10,
+    "PDF_OPEN_COMMAND": None,
+    "DEDUPLICATE": True,
+    "CHECKPOINT_DIR": "checkpoints",
+    "CHECKPOINT_INTERVAL": 200,
+    "INDEX_MEMORY_MB": 0,
+    "SPILL_DIR": "spill",
+    "OCR_ENABLED": False,
+    "OCR_PROCESSES": 1,
+    "OCR_LANGUAGE": "eng",
+    "OCR_DPI": 300,
+    "OCR_CACHE_DIR": "ocr_cache",
 }
 
 
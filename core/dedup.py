@@ -0,0 +1,67 @@
+# core/dedup.py
+import hashlib
+import os
+
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PARTIAL_HASH_BYTES = 64 * 1024
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of the whole file."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def partial_hash(file_path, size, nbytes=PARTIAL_HASH_BYTES):
+    """Cheap fingerprint from the first and last ``nbytes`` of a file."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        h.update(f.read(nbytes))
+        if size > 2 * nbytes:
+            f.seek(-nbytes, os.SEEK_END)
+            h.update(f.read(nbytes))
+    return h.digest()
+
+
+def _group(paths, key):
+    groups = {}
+    for path in paths:
+        try:
+            k = key(path)
+        except OSError as e:
+            logger.warning(f"Skipping {path} during duplicate check: {e}")
+            continue
+        groups.setdefault(k, []).append(path)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def find_duplicates(paths):
+    """
+    Find files with identical content.
+
+    Files are grouped by size first, then by a partial hash, and only the
+    survivors are hashed in full, so unique files are never read beyond a
+    ``stat``. Returns ``{canonical path: [duplicate paths]}`` where the
+    canonical path is the first occurrence in ``paths``.
+    """
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            continue
+
+    duplicates = {}
+    for same_size in _group(sizes, sizes.get):
+        size = sizes[same_size[0]]
+        for same_prefix in _group(same_size, lambda p: partial_hash(p, size)):
+            for same_content in _group(same_prefix, file_hash):
+                canonical, *copies = same_content
+                duplicates[canonical] = copies
+    return duplicates
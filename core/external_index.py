@@ -0,0 +1,123 @@
+# core/external_index.py
+import heapq
+import json
+import shutil
+import sys
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from core.compact_index import CompactIndex
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DOCUMENTS_FILE = "documents.jsonl"
+
+# Rough cost of one buffered (term, doc id) pair: the tuple, the int and the
+# list slot. Terms are interned, so their text is counted once per run.
+PAIR_BYTES = 100
+
+
+class ExternalIndexBuilder:
+    """
+    Memory-bounded index construction for corpora larger than RAM.
+
+    Documents are numbered as they arrive and written to a document log
+    (path, keywords, page hits). Their ``(term, doc id)`` pairs are buffered
+    until the buffer reaches the memory budget, then sorted by term and
+    spilled to a run file. ``finish()`` k-way merges the runs into one
+    posting array per term, so the full ``{path: [keywords]}`` mapping is
+    never held in memory. Keywords arrive already selected by the workers.
+    """
+
+    def __init__(self, spill_dir, memory_budget_mb):
+        self.dir = Path(spill_dir)
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
+        self.dir.mkdir(parents=True)
+        self.budget = memory_budget_mb * 1024 * 1024
+        self._documents = open(self.dir / DOCUMENTS_FILE, "w", encoding="utf-8")
+        self._pairs = []
+        self._terms = set()
+        self._buffered = 0
+        self._runs = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, path, keywords, term_pages=None):
+        doc_id = self.count
+        self.count += 1
+        self._documents.write(json.dumps([path, keywords, term_pages]) + "\n")
+        for term in keywords:
+            term = sys.intern(term)
+            if term not in self._terms:
+                self._terms.add(term)
+                self._buffered += sys.getsizeof(term)
+            self._pairs.append((term, doc_id))
+        self._buffered += PAIR_BYTES * len(keywords)
+        if self._buffered >= self.budget:
+            self._spill()
+
+    def _spill(self):
+        if not self._pairs:
+            return
+        # Stable sort: doc ids are added in order, so they stay ascending per term
+        self._pairs.sort(key=itemgetter(0))
+        run = self.dir / f"run-{len(self._runs):05d}.tsv"
+        with open(run, "w", encoding="utf-8") as f:
+            for term, doc_id in self._pairs:
+                f.write(f"{term}\t{doc_id}\n")
+        logger.info(f"Spilled {len(self._pairs)} postings to {run.name}")
+        self._runs.append(run)
+        self._pairs = []
+        self._terms = set()
+        self._buffered = 0
+
+    def documents(self):
+        """Yield ``(path, keywords, page hits or None)`` in doc id order."""
+        with open(self.dir / DOCUMENTS_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                yield tuple(json.loads(line))
+
+    @staticmethod
+    def _read_run(run):
+        with open(run, "r", encoding="utf-8") as f:
+            for line in f:
+                term, doc_id = line.rstrip("\n").split("\t")
+                yield term, int(doc_id)
+
+    def finish(self, duplicates=None):
+        """
+        Merge the spilled runs into a CompactIndex.
+
+        Returns ``(index, duplicates)`` with the duplicate map reduced to the
+        documents that were actually indexed.
+        """
+        self._spill()
+        self._documents.close()
+        duplicates = duplicates or {}
+
+        index = CompactIndex()
+        kept = {}
+        for path, _, term_pages in self.documents():
+            copies = duplicates.get(path)
+            if copies:
+                kept[path] = copies
+            index.add_document(path, (), term_pages, copies)
+
+        # Runs hold consecutive doc id ranges and heapq.merge is stable, so
+        # every merged posting list comes out sorted.
+        merged = heapq.merge(*(self._read_run(run) for run in self._runs), key=itemgetter(0))
+        for term, pairs in groupby(merged, key=itemgetter(0)):
+            index.add_postings(term, (doc_id for _, doc_id in pairs))
+        logger.info(f"Merged {len(self._runs)} run(s) into {len(index.terms)} posting lists")
+        return index, kept
+
+    def clear(self):
+        if not self._documents.closed:
+            self._documents.close()
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
@@ -0,0 +1,111 @@
+# core/fuzzy.py
+import weakref
+from itertools import combinations
+
+
+def _deletes(word, max_distance):
+    """All strings reachable from ``word`` by removing up to ``max_distance`` chars."""
+    variants = {word}
+    for d in range(1, min(max_distance, len(word)) + 1):
+        for drop in combinations(range(len(word)), d):
+            variants.add("".join(c for i, c in enumerate(word) if i not in drop))
+    return variants
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal-string-alignment distance between ``a`` and ``b``, or
+    ``max_distance + 1`` as soon as it is known to exceed the bound.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (
+                prev2 is not None
+                and j > 1
+                and a[i - 1] == b[j - 2]
+                and a[i - 2] == b[j - 1]
+            ):
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class FuzzyMatcher:
+    """
+    Symmetric-delete index over a term vocabulary.
+
+    Every vocabulary term is registered under all of its deletions up to
+    ``max_distance``; a query word only has to generate its own deletions
+    and look them up, which keeps typo lookup to a handful of dict probes
+    and makes it cheap enough for live search.
+    """
+
+    def __init__(self, terms, max_distance=1, min_length=4):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.size = len(terms)
+        self._terms = terms
+        self._deletes = {}
+
+        shortest = max(1, min_length - max_distance)
+        for term_id, term in enumerate(terms):
+            if len(term) < shortest:
+                continue
+            for variant in _deletes(term, max_distance):
+                ids = self._deletes.get(variant)
+                if ids is None:
+                    self._deletes[variant] = term_id
+                elif isinstance(ids, int):
+                    self._deletes[variant] = [ids, term_id]
+                else:
+                    ids.append(term_id)
+
+    def lookup(self, word):
+        """Return ``[(term, distance), ...]`` for vocabulary terms close to ``word``."""
+        if self.max_distance < 1 or len(word) < self.min_length:
+            return []
+
+        candidates = set()
+        for variant in _deletes(word, self.max_distance):
+            ids = self._deletes.get(variant)
+            if ids is None:
+                continue
+            if isinstance(ids, int):
+                candidates.add(ids)
+            else:
+                candidates.update(ids)
+
+        matches = []
+        for term_id in candidates:
+            term = self._terms[term_id]
+            distance = edit_distance(word, term, self.max_distance)
+            if distance <= self.max_distance:
+                matches.append((term, distance))
+        return sorted(matches, key=lambda m: (m[1], m[0]))
+
+
+_matchers = weakref.WeakKeyDictionary()
+
+
+def get_matcher(index, max_distance=1, min_length=4):
+    """Return the FuzzyMatcher for ``index``, building it once per vocabulary."""
+    matcher = _matchers.get(index)
+    if (
+        matcher is None
+        or matcher.size != len(index.terms)
+        or matcher.max_distance != max_distance
+        or matcher.min_length != min_length
+    ):
+        matcher = FuzzyMatcher(index.terms, max_distance, min_length)
+        _matchers[index] = matcher
+    return matcher
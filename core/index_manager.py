@@ -1,21 +1,417 @@
+import hashlib
 import json
+import os
+import shutil
+import tempfile
+import time
 from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
 
+from core.checkpoint import clear_checkpoint
+from core.compact_index import CompactIndex
+from core.config import load_config
+from core.logger import setup_logger
+from core.normalization import normalizer_settings
 
-def save_index(data, output_file):
-    with open(output_file, "w") as f:
-        json.dump(data, f, indent=2)
+logger = setup_logger(__name__)
 
+INDEX_VERSION = 2
+KEEP_GENERATIONS = 2
 
-def load_index(output_file):
-    with open(output_file, "r") as f:
+_HEADER = f'{{"version": {INDEX_VERSION},\n'
+
+
+class _HashingWriter:
+    """Binary file wrapper for json.dump that hashes what it writes."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, s):
+        data = s.encode("utf-8")
+        self.sha256.update(data)
+        self.size += len(data)
+        self.f.write(data)
+
+
+def _fsync_dir(directory):
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data, indent=None):
+    """
+    Write JSON to ``path`` through a temp file and a rename, so readers see
+    either the old file or the complete new one. Returns ``(sha256, size)``.
+    """
+    return _atomic_write(path, lambda writer: json.dump(data, writer, indent=indent))
+
+
+def _atomic_write(path, dump):
+    """Call ``dump(writer)`` to produce the content of ``path``, then publish it atomically."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            writer = _HashingWriter(f)
+            dump(writer)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    _fsync_dir(path.parent.resolve())
+    return writer.sha256.hexdigest(), writer.size
+
+
+@contextmanager
+def _writer_lock(output_file):
+    """Serialize index writers; the OS drops the lock if a writer dies."""
+    output_file = Path(output_file)
+    lock_path = output_file.with_name(f"{output_file.stem}.lock")
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def manifest_path(output_file):
+    output_file = Path(output_file)
+    return output_file.with_name(f"{output_file.stem}.manifest.json")
+
+
+def _generation_file(output_file, generation):
+    output_file = Path(output_file)
+    return output_file.with_name(f"{output_file.stem}.{generation:06d}{output_file.suffix}")
+
+
+def read_manifest(output_file):
+    path = manifest_path(output_file)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def generate_autocomplete(data, top_n):
-    words = []
-    for kws in data.values():
-        words.extend(kws)
-    freq = Counter(words)
-    return [w for w, _ in freq.most_common(top_n)]
+def index_exists(output_file):
+    return manifest_path(output_file).exists() or Path(output_file).exists()
+
+
+def _dump_payload(writer, records, duplicates, scratch_dir):
+    """
+    Stream the index JSON from ``(path, keywords, page hits or None)``
+    records, one document per line. Page hits go to a scratch file first and
+    are copied in after the documents, so the records are read only once.
+    """
+    writer.write(f'{_HEADER}"documents": {{')
+    with tempfile.TemporaryFile("w+", encoding="utf-8", dir=scratch_dir) as pages_tmp:
+        doc_sep = page_sep = "\n"
+        for path, keywords, term_pages in records:
+            key = json.dumps(path)
+            writer.write(f"{doc_sep}{key}: {json.dumps(keywords)}")
+            doc_sep = ",\n"
+            if term_pages:
+                pages_tmp.write(f"{page_sep}{key}: {json.dumps(term_pages)}")
+                page_sep = ",\n"
+        writer.write('\n},\n"pages": {')
+        pages_tmp.seek(0)
+        shutil.copyfileobj(pages_tmp, writer)
+    writer.write(f'\n}},\n"duplicates": {json.dumps(duplicates or {})}\n}}\n')
+
+
+def save_index(
+    data, output_file, pages=None, duplicates=None, text_store_dir=None, checkpoint_dir=None
+):
+    """Publish ``{path: [keywords]}`` and its page hits as a new index generation."""
+    pages = pages or {}
+    records = ((path, keywords, pages.get(path)) for path, keywords in data.items())
+    return save_index_records(records, output_file, duplicates, text_store_dir, checkpoint_dir)
+
+
+def save_index_records(
+    records, output_file, duplicates=None, text_store_dir=None, checkpoint_dir=None
+):
+    """
+    Publish a new index generation from ``(path, keywords, page hits or
+    None)`` records, streamed straight to disk.
+
+    The index is written to ``<stem>.<generation>.json`` and a staged text
+    store, if given, is moved to ``<stem>.<generation>.text``. Only then is
+    the manifest atomically replaced to point at them, so concurrent readers
+    keep loading the previous generation until the new one is complete.
+    The previous generation is kept for readers that are mid-load. The
+    indexing run's ``checkpoint_dir`` is removed right after the manifest,
+    since its journal no longer matches the moved text store. The
+    normalization settings the keywords were produced with are recorded in
+    the manifest (see ``normalizer_mismatch``). Returns the new manifest.
+    """
+    with _writer_lock(output_file):
+        current = read_manifest(output_file)
+        generation = (current["generation"] if current else 0) + 1
+        index_file = _generation_file(output_file, generation)
+        sha256, size = _atomic_write(
+            index_file,
+            lambda writer: _dump_payload(writer, records, duplicates, index_file.parent),
+        )
+
+        text_store = None
+        if text_store_dir and Path(text_store_dir).exists():
+            published = index_file.with_suffix(".text")
+            if published.exists():
+                shutil.rmtree(published)
+            os.replace(text_store_dir, published)
+            text_store = published.name
+
+        if current is not None:
+            current.pop("previous", None)
+        manifest = {
+            "generation": generation,
+            "file": index_file.name,
+            "sha256": sha256,
+            "size": size,
+            "text_store": text_store,
+            "normalizer": normalizer_settings(load_config()),
+            "created": time.time(),
+            "previous": current,
+        }
+        atomic_write_json(manifest_path(output_file), manifest, indent=2)
+        if checkpoint_dir:
+            clear_checkpoint(checkpoint_dir)
+        _remove_old_generations(output_file, generation - KEEP_GENERATIONS)
+    logger.info(f"Published index generation {generation} ({size} bytes)")
+    return manifest
+
+
+def _remove_old_generations(output_file, up_to):
+    output_file = Path(output_file)
+    for path in output_file.parent.glob(f"{output_file.stem}.*"):
+        generation = path.name[len(output_file.stem) + 1 :].split(".")[0]
+        if not generation.isdigit() or int(generation) > up_to:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink()
+
+
+def _upgrade(payload):
+    if not isinstance(payload.get("version"), int):
+        payload = {"version": 1, "documents": payload}
+    payload.setdefault("pages", {})
+    payload.setdefault("duplicates", {})
+    return payload
+
+
+def _load_generation(output_file, entry):
+    path = Path(output_file).with_name(entry["file"])
+    raw = path.read_bytes()
+    if hashlib.sha256(raw).hexdigest() != entry["sha256"]:
+        raise ValueError(f"checksum mismatch in {path}")
+    payload = _upgrade(json.loads(raw))
+    payload["generation"] = entry["generation"]
+    payload["text_store"] = None
+    if entry.get("text_store"):
+        payload["text_store"] = str(Path(output_file).with_name(entry["text_store"]))
+    return payload
+
+
+def load_index(output_file):
+    """
+    Load the current index generation as ``{"version", "documents", "pages",
+    "duplicates", "generation", "text_store"}``.
+
+    The generation file's checksum is verified against the manifest. If it
+    does not match, the previous generation is used instead. Without a
+    manifest, ``output_file`` itself is read. That covers version 1 files (a
+    bare ``{path: [keywords]}`` mapping), which are upgraded on the fly with
+    no page or duplicate data.
+    """
+    for attempt in range(2):
+        manifest = read_manifest(output_file)
+        if manifest is None:
+            with open(output_file, "r") as f:
+                payload = _upgrade(json.load(f))
+            payload["generation"] = 0
+            payload["text_store"] = None
+            return payload
+
+        for entry in (manifest, manifest.get("previous")):
+            if not entry:
+                continue
+            try:
+                return _load_generation(output_file, entry)
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping index generation {entry['generation']}: {e}")
+        # A writer may have published twice while we were reading; look again.
+    raise ValueError(f"No intact index generation found for {output_file}")
+
+
+def _entries(lines, closing):
+    """Yield ``(key, value)`` for each one-entry line up to ``closing``."""
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line == closing:
+            return
+        entry = json.loads("{" + line.rstrip(",") + "}")
+        if len(entry) != 1:
+            raise ValueError("expected one entry per line")
+        yield next(iter(entry.items()))
+    raise ValueError("index file ends early")
+
+
+def _stream_generation(output_file, entry):
+    """
+    Fill a CompactIndex from a generation file written by ``_dump_payload``
+    without parsing the whole file at once. Returns None if the file is in
+    another layout (written by an older version).
+    """
+    path = Path(output_file).with_name(entry["file"])
+    sha256 = hashlib.sha256()
+
+    def read_lines(f):
+        for raw in f:
+            sha256.update(raw)
+            yield raw.decode("utf-8")
+
+    with open(path, "rb") as f:
+        if f.readline() != _HEADER.encode("utf-8"):
+            return None
+        f.seek(0)
+        lines = read_lines(f)
+        next(lines)
+        if next(lines, None) != '"documents": {\n':
+            return None
+
+        index = CompactIndex()
+        for doc_path, keywords in _entries(lines, "},"):
+            index.add_document(doc_path, keywords)
+
+        if next(lines, None) != '"pages": {\n':
+            raise ValueError("missing pages section")
+        # Page hits are written in document order
+        doc_id = 0
+        for doc_path, term_pages in _entries(lines, "},"):
+            while doc_id < len(index) and index.path(doc_id) != doc_path:
+                doc_id += 1
+            if doc_id == len(index):
+                raise ValueError(f"page hits for unknown document {doc_path}")
+            index.set_pages(doc_id, term_pages)
+
+        tail = "".join(lines)
+    if sha256.hexdigest() != entry["sha256"]:
+        raise ValueError(f"checksum mismatch in {path}")
+
+    duplicates = json.loads("{" + tail)["duplicates"]
+    if duplicates:
+        for doc_id in range(len(index)):
+            index.set_duplicates(doc_id, duplicates.get(index.path(doc_id)))
+
+    index.generation = entry["generation"]
+    if entry.get("text_store"):
+        index.text_store_dir = str(Path(output_file).with_name(entry["text_store"]))
+    return index
+
+
+def load_compact_index(output_file):
+    """
+    Load the current index generation straight into a CompactIndex.
+
+    Unlike ``load_index``, the file is read one document at a time, so the
+    full ``{path: [keywords]}`` mapping is never built. This is how indexes
+    written in bounded-memory mode (``INDEX_MEMORY_MB``) are opened. The
+    checksum and previous-generation fallback work as in ``load_index``;
+    files in an older layout are loaded through it.
+    """
+    for attempt in range(2):
+        manifest = read_manifest(output_file)
+        if manifest is None:
+            return _compact(load_index(output_file))
+
+        for entry in (manifest, manifest.get("previous")):
+            if not entry:
+                continue
+            try:
+                index = _stream_generation(output_file, entry)
+                if index is None:
+                    index = _compact(_load_generation(output_file, entry))
+                return index
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping index generation {entry['generation']}: {e}")
+        # A writer may have published twice while we were reading; look again.
+    raise ValueError(f"No intact index generation found for {output_file}")
+
+
+def _compact(saved):
+    index = CompactIndex.from_dict(saved["documents"], saved["pages"], saved["duplicates"])
+    index.generation = saved["generation"]
+    index.text_store_dir = saved["text_store"]
+    return index
+
+
+def normalizer_mismatch(output_file, cfg):
+    """
+    Why the published index does not match the configured normalization,
+    or None if it does.
+
+    Keywords are stored normalized, so an index built with other settings
+    (or before they were recorded, when keywords were not stemmed) silently
+    misses queries until it is rebuilt.
+    """
+    manifest = read_manifest(output_file)
+    recorded = manifest.get("normalizer") if manifest else None
+    current = normalizer_settings(cfg)
+    if recorded is None:
+        return (
+            "The index was built by an older version that did not normalize "
+            "keywords the way searches now do."
+        )
+    changed = sorted(key for key in current if recorded.get(key) != current[key])
+    if changed:
+        return f"The index was built with different normalization settings ({', '.join(changed)})."
+    return None
+
+
+def generate_autocomplete(data, top_n, forms=None):
+    """
+    The ``top_n`` keywords found in the most documents.
+
+    Keywords are normalized terms (e.g. Porter stems). With ``forms`` from
+    indexing (``{term: {original word: documents}}``), each is replaced by
+    its most common original word, which is what the user should see and
+    normalizes back to the same term when searched.
+    """
+    if isinstance(data, CompactIndex):
+        # Same counts without materializing every keyword list
+        freq = Counter(data.document_frequencies())
+    else:
+        freq = Counter()
+        for kws in data.values():
+            freq.update(kws)
+    words = {}
+    for term, _ in freq.most_common(top_n):
+        spellings = forms.get(term) if forms else None
+        words.setdefault(max(spellings, key=spellings.get) if spellings else term, None)
+    return list(words)
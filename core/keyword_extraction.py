@@ -1,29 +1,131 @@
+import heapq
 import re
+from collections import Counter
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 
-from rake_nltk import Rake
+from core.normalization import get_normalizer
 
+# A candidate phrase is dropped if it has a one-letter word, a digit or
+# punctuation in it.
+_REJECT_PHRASE = re.compile(r"\b\w\b|\d|[*&!()?/>.<,:;\"\]\[\}\{]")
 
-def rake_keywords(text):
+
+@lru_cache(maxsize=8)
+def _get_rake(stopwords):
+    # Imported here: rake_nltk pulls in all of NLTK, which query-only
+    # callers should not pay for at import time.
+    from rake_nltk import Rake
+
+    return Rake(stopwords=set(stopwords) if stopwords else None)
+
+
+def rake_words(text, stopwords=None):
+    """
+    Yield the words of RAKE's candidate phrases in ``text``, filtered as
+    described above and lowercased, keeping words longer than two letters.
+
+    This only splits the text into candidate phrases the way RAKE does. It
+    skips RAKE's co-occurrence graph and phrase ranking, because only the
+    words are used.
+    """
     if not text or not text.strip():
-        return []
-
-    r = Rake()
-    r.extract_keywords_from_text(text)
-    ranked_phrases = r.get_ranked_phrases()
-    filtered = []
-
-    for phrase in ranked_phrases:
-        if any(
-            [
-                re.search(r"\b\w\b", phrase),
-                re.search(r"\d", phrase),
-                re.search(r"[*&!()?/>.<,:;\"\]\[\}\{]", phrase),
-            ]
-        ):
-            continue
-
-        for word in phrase.split():
-            if len(word) > 2:
-                filtered.append(word.lower())
-
-    return filtered
+        return
+    rake = _get_rake(tuple(stopwords) if stopwords else None)
+    to_ignore = rake.to_ignore
+    for sentence in rake.sentence_tokenizer(text):
+        words = [w.lower() for w in rake.word_tokenizer(sentence)]
+        for keep, group in groupby(words, lambda w: w not in to_ignore):
+            if not keep:
+                continue
+            phrase = " ".join(group)
+            if _REJECT_PHRASE.search(phrase):
+                continue
+            for word in phrase.split():
+                if len(word) > 2:
+                    yield word
+
+
+def rake_keywords(text, stopwords=None):
+    return list(rake_words(text, stopwords))
+
+
+def extract_terms(text, normalizer=None):
+    """RAKE keywords run through the normalization pipeline (index and query side)."""
+    normalizer = normalizer or get_normalizer()
+    return normalizer.normalize(rake_keywords(text, normalizer.stopwords))
+
+
+def count_terms(chunks, normalizer=None, max_chars=None, forms=None):
+    """
+    Count normalized keywords over text chunks (e.g. pages) as they stream
+    in, without keeping the text or the word list. Counting stops after
+    ``max_chars`` characters, so huge documents cost a bounded amount of work.
+
+    If a ``forms`` Counter is given, every ``(term, original word)`` pair
+    is counted in it too (see ``best_forms``).
+    """
+    normalizer = normalizer or get_normalizer()
+    stopwords = normalizer.stopwords
+    counts = Counter()
+    seen = 0
+    for chunk in chunks:
+        if max_chars:
+            if seen >= max_chars:
+                break
+            if len(chunk) > max_chars - seen:
+                # Cut at a word boundary, not in the middle of a word
+                head = chunk[: max_chars - seen].rsplit(None, 1)
+                chunk = head[0] if head else ""
+                seen = max_chars
+            else:
+                seen += len(chunk)
+        for word in rake_words(chunk, stopwords):
+            term = normalizer.normalize_token(word)
+            if term:
+                counts[term] += 1
+                if forms is not None:
+                    forms[term, word] += 1
+    return counts
+
+
+def best_forms(forms, terms):
+    """
+    ``{term: most frequent original word}`` for ``terms``, from a Counter
+    of ``(term, word)`` pairs filled by ``count_terms``. Stems such as
+    'optim' are not words; this is what users should be shown instead.
+    """
+    terms = set(terms)
+    best = {}
+    for (term, word), n in forms.items():
+        if term in terms and n > best.get(term, (None, 0))[1]:
+            best[term] = (word, n)
+    return {term: word for term, (word, _) in best.items()}
+
+
+def merge_forms(target, forms):
+    """
+    Add one or more documents' forms to ``target``, a
+    ``{term: {word: number of documents}}`` mapping. ``forms`` is either
+    ``best_forms`` output or another mapping of the same shape as ``target``.
+    """
+    for term, words in forms.items():
+        counts = target.setdefault(term, Counter())
+        if isinstance(words, str):
+            counts[words] += 1
+        else:
+            counts.update(words)
+    return target
+
+
+def top_terms(counts, top_n):
+    """The ``top_n`` most frequent terms (all if None), selected with a bounded heap."""
+    if top_n is None:
+        return list(counts)
+    return [term for term, _ in heapq.nlargest(top_n, counts.items(), key=itemgetter(1))]
+
+
+def warm_up(normalizer=None):
+    """Load RAKE and the normalizer ahead of the first query."""
+    extract_terms("warm up", normalizer)
@@ -0,0 +1,114 @@
+# core/normalization.py
+import unicodedata
+from functools import lru_cache
+
+from core.config import load_config
+
+TOKEN_CACHE_SIZE = 200_000
+
+
+def _load_stemmer(name):
+    if not name:
+        return None
+    name = name.lower()
+    if name == "porter":
+        from nltk.stem import PorterStemmer
+
+        return PorterStemmer()
+    if name == "snowball":
+        from nltk.stem.snowball import SnowballStemmer
+
+        return SnowballStemmer("english")
+    if name == "lancaster":
+        from nltk.stem import LancasterStemmer
+
+        return LancasterStemmer()
+    raise ValueError(f"Unknown stemmer: {name}")
+
+
+def fold_unicode(token):
+    """Strip accents and compatibility forms: 'Café' -> 'cafe', 'ﬁle' -> 'file'."""
+    decomposed = unicodedata.normalize("NFKD", token)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class Normalizer:
+    """
+    Token normalization shared by indexing and querying.
+
+    The same instance settings must be used on both sides, otherwise query
+    terms will not line up with index terms. Per-token results are memoized
+    because document vocabularies repeat heavily.
+    """
+
+    def __init__(
+        self,
+        unicode_fold=True,
+        stemmer="porter",
+        extra_stopwords=(),
+        keep_stopwords=(),
+        cache_size=TOKEN_CACHE_SIZE,
+    ):
+        self.unicode_fold = unicode_fold
+        self.stemmer_name = stemmer
+        self.extra_stopwords = {w.lower() for w in extra_stopwords}
+        self.keep_stopwords = {w.lower() for w in keep_stopwords}
+        self._stemmer = _load_stemmer(stemmer)
+        self._stopwords = None
+        self.normalize_token = lru_cache(maxsize=cache_size)(self._normalize_token)
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(**normalizer_settings(cfg))
+
+    @property
+    def stopwords(self):
+        """Stopword list for RAKE, or None to use NLTK's English list as is."""
+        if not self.extra_stopwords and not self.keep_stopwords:
+            return None
+        if self._stopwords is None:
+            from nltk.corpus import stopwords
+
+            words = set(stopwords.words("english")) | self.extra_stopwords
+            self._stopwords = sorted(words - self.keep_stopwords)
+        return self._stopwords
+
+    def _normalize_token(self, token):
+        token = fold_unicode(token) if self.unicode_fold else token.lower()
+        if self._stemmer is not None:
+            token = self._stemmer.stem(token)
+        return token
+
+    def normalize(self, tokens):
+        result = []
+        for token in tokens:
+            term = self.normalize_token(token)
+            if term:
+                result.append(term)
+        return result
+
+
+def normalizer_settings(cfg):
+    """
+    The config settings that decide which term a word normalizes to.
+
+    They are recorded with every published index, because an index only
+    matches queries normalized the same way.
+    """
+    return {
+        "unicode_fold": bool(cfg["UNICODE_FOLD"]),
+        "stemmer": cfg["STEMMER"].lower() if cfg["STEMMER"] else None,
+        "extra_stopwords": sorted({w.lower() for w in cfg["EXTRA_STOPWORDS"]}),
+        "keep_stopwords": sorted({w.lower() for w in cfg["KEEP_STOPWORDS"]}),
+    }
+
+
+_default = None
+
+
+def get_normalizer():
+    """Return the process-wide Normalizer configured from config.json."""
+    global _default
+    if _default is None:
+        _default = Normalizer.from_config(load_config())
+    return _default
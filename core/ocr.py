@@ -0,0 +1,119 @@
+# core/ocr.py
+import json
+import os
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from core.dedup import file_hash
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+OCR_NICENESS = 10
+_BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+
+OcrSettings = namedtuple("OcrSettings", ["processes", "cache_dir", "language", "dpi"])
+
+
+def ocr_settings(cfg):
+    """OcrSettings from the config, or None when OCR is disabled."""
+    if not cfg["OCR_ENABLED"]:
+        return None
+    return OcrSettings(
+        processes=cfg["OCR_PROCESSES"],
+        cache_dir=cfg["OCR_CACHE_DIR"],
+        language=cfg["OCR_LANGUAGE"],
+        dpi=cfg["OCR_DPI"],
+    )
+
+
+def lower_priority():
+    """Process pool initializer: run OCR workers below normal extraction."""
+    try:
+        if hasattr(os, "nice"):
+            os.nice(OCR_NICENESS)
+        elif sys.platform == "win32":
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), _BELOW_NORMAL_PRIORITY_CLASS)
+    except Exception as e:
+        logger.warning(f"Could not lower OCR worker priority: {e}")
+
+
+def image_only_pages(file_path, empty):
+    """
+    Return the 0-based indexes, among ``empty`` (pages whose extracted text
+    was blank), of PDF pages that contain images, i.e. scanned pages worth
+    sending to OCR.
+    """
+    if not empty:
+        return []
+    import fitz
+
+    try:
+        with fitz.open(file_path) as pdf_document:
+            return [i for i in empty if pdf_document[i].get_images()]
+    except Exception as e:
+        logger.error(f"Error inspecting PDF {file_path} for OCR: {e}")
+        return []
+
+
+class OcrCache:
+    """OCR output keyed by file content hash, one JSON file per document."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry(self, digest):
+        return self.cache_dir / f"{digest}.json"
+
+    def get(self, digest):
+        entry = self._entry(digest)
+        if not entry.exists():
+            return {}
+        try:
+            with open(entry, "r", encoding="utf-8") as f:
+                return {int(k): v for k, v in json.load(f).items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable OCR cache entry {entry}: {e}")
+            return {}
+
+    def put(self, digest, page_texts):
+        entry = self._entry(digest)
+        tmp = entry.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(page_texts, f)
+        os.replace(tmp, entry)
+
+
+def ocr_pdf_pages(file_path, page_indexes, cache_dir, language="eng", dpi=300):
+    """
+    OCR the given 0-based pages of a PDF with Tesseract.
+
+    Returns ``{page index: text}``. Results are cached by content hash, so a
+    file (or any copy of it) is only ever OCRed once per page.
+    """
+    import fitz
+    import pytesseract
+    from PIL import Image
+
+    cache = OcrCache(cache_dir)
+    digest = file_hash(file_path)
+    texts = cache.get(digest)
+    missing = [i for i in page_indexes if i not in texts]
+    if not missing:
+        return {i: texts[i] for i in page_indexes}
+
+    with fitz.open(file_path) as pdf_document:
+        for i in missing:
+            pix = pdf_document[i].get_pixmap(dpi=dpi)
+            mode = "RGBA" if pix.alpha else "RGB"
+            image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+            texts[i] = pytesseract.image_to_string(image, lang=language)
+
+    cache.put(digest, texts)
+    logger.info(f"OCR: {len(missing)} page(s) of {file_path}")
+    return {i: texts[i] for i in page_indexes}
@@ -1,54 +1,449 @@
 import concurrent.futures
+import heapq
+import multiprocessing
 import os
+import time
 from collections import Counter
+from functools import partial
 from pathlib import Path
 
-from core.keyword_extraction import rake_keywords
+from core.checkpoint import Checkpoint, has_checkpoint, run_fingerprint
+from core.config import load_config
+from core.dedup import find_duplicates
+from core.keyword_extraction import best_forms, count_terms, merge_forms, top_terms
 from core.logger import setup_logger
-from core.text_extraction import extract_text_docx, extract_text_pdf
+from core.normalization import normalizer_settings
+from core.ocr import image_only_pages, lower_priority, ocr_pdf_pages
+from core.text_extraction import (
+    find_extractor,
+    iter_pdf_pages,
+    iter_text,
+    unsupported_formats,
+)
+from core.text_store import TextStoreWriter, build_lookup, clear_text_store
 
 logger = setup_logger(__name__)
 
+MAX_PAGES_PER_TERM = 20
+PAGE_TOP_KEYWORDS = 10
+MAX_KEYWORD_CHARS = 5_000_000
+CHECKPOINT_INTERVAL = 200
+CANCEL_POLL_SECONDS = 0.5
 
-def extract_keywords_from_file(file_path):
-    if file_path.endswith(".pdf"):
-        text = extract_text_pdf(file_path)
-    elif file_path.endswith(".docx"):
-        text = extract_text_docx(file_path)
+_cancel_event = None  # set in worker processes by _init_worker
+
+
+class IndexingCancelled(Exception):
+    """Raised when indexing is cancelled; finished work stays checkpointed."""
+
+
+def page_keywords(
+    per_page,
+    totals,
+    top_n,
+    max_pages_per_term=MAX_PAGES_PER_TERM,
+    page_top_n=PAGE_TOP_KEYWORDS,
+):
+    """
+    Select a document's keywords from its per-page term counts.
+
+    Returns the keywords and, for each of them, the pages where it occurs
+    most often (at most ``max_pages_per_term``, in page order, 1-based).
+    The keywords are the document's top ``top_n`` terms plus the top
+    ``page_top_n`` terms of every page, so a topic confined to a few pages
+    of a long document can still be found. Rarer terms are deliberately
+    left out to keep the index bounded.
+    """
+    keywords = dict.fromkeys(top_terms(totals, top_n))
+    if page_top_n:
+        for counts in per_page:
+            keywords.update(dict.fromkeys(top_terms(counts, page_top_n)))
+    keywords = list(keywords)
+
+    hits = {kw: [] for kw in keywords}
+    for page_no, counts in enumerate(per_page, 1):
+        for kw, n in counts.items():
+            if kw in hits:
+                hits[kw].append((-n, page_no))
+    term_pages = {
+        kw: sorted(page for _, page in heapq.nsmallest(max_pages_per_term, found))
+        for kw, found in hits.items()
+    }
+    return keywords, term_pages
+
+
+def index_chunks(
+    chunks,
+    top_n,
+    page_level=False,
+    max_chars=MAX_KEYWORD_CHARS,
+    page_top_n=PAGE_TOP_KEYWORDS,
+    keep_text=False,
+):
+    """
+    Count a document's keywords as its text chunks stream out of the
+    extractor. With ``page_level``, each chunk is a page.
+
+    Returns ``(keywords, page hits or None, forms, text, empty)``:
+    ``forms`` maps each keyword to the word it was most often spelled as,
+    ``text`` is the chunks read (form-feed separated) if ``keep_text`` and
+    None otherwise, and ``empty`` lists the 0-based indexes of chunks
+    without text. After ``max_chars`` characters nothing more is read, and
+    the chunk generator is closed so that extraction stops too.
+    """
+    forms = Counter()
+    totals = Counter()
+    per_page = [] if page_level else None
+    texts = [] if keep_text else None
+    empty = []
+    remaining = max_chars
+    chunks = iter(chunks)
+    try:
+        for i, chunk in enumerate(chunks):
+            _check_cancelled()
+            if not chunk.strip():
+                empty.append(i)
+            if texts is not None:
+                texts.append(chunk)
+            counts = count_terms([chunk], max_chars=remaining, forms=forms)
+            if per_page is not None:
+                per_page.append(counts)
+            totals.update(counts)
+            if max_chars:
+                remaining -= len(chunk)
+                if remaining <= 0:
+                    break
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    if per_page is not None and len(per_page) > 1:
+        kws, term_pages = page_keywords(per_page, totals, top_n, page_top_n=page_top_n)
     else:
-        return []
-    return rake_keywords(text)
+        kws, term_pages = top_terms(totals, top_n), None
+    text = "\f".join(texts) if texts is not None else None
+    return kws, term_pages, best_forms(forms, kws), text, empty
 
 
-def process_batch(batch_file):
+def read_batch(batch_file):
+    with open(batch_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f]
+
+
+def _init_worker(cancel_event, low_priority=False):
+    """Process pool initializer: share the cancel flag, optionally lower priority."""
+    global _cancel_event
+    _cancel_event = cancel_event
+    if low_priority:
+        lower_priority()
+
+
+def _check_cancelled():
+    if _cancel_event is not None and _cancel_event.is_set():
+        raise IndexingCancelled()
+
+
+def process_paths(
+    unit,
+    paths,
+    text_store_dir=None,
+    top_n=None,
+    page_level=False,
+    ocr=None,
+    skip=frozenset(),
+    page_top_n=PAGE_TOP_KEYWORDS,
+    formats=None,
+):
+    """
+    Index one unit of work: a named chunk of file paths.
+
+    Paths in ``skip`` (duplicate copies) and files whose format is not in
+    ``formats`` (all registered formats if None) are ignored. Each file's
+    text is counted as it is extracted and kept only for the text store.
+    Returns
+    ``(unit, keywords, pages, ocr_jobs, forms)``: keywords and page hits by
+    path, ``(path, scanned page indexes)`` for PDFs that need OCR when
+    ``ocr`` settings are given, and the original spellings of the keywords
+    (see ``merge_forms``). PDFs that need OCR are left out of the rest and
+    finished later by ``process_ocr_document``.
+    """
     result = {}
-    if not os.path.exists(batch_file):
-        logger.error(f"Batch file not found: {batch_file}")
-        return result
+    pages_result = {}
+    ocr_jobs = []
+    forms = {}
 
-    with open(batch_file, "r", encoding="utf-8") as f:
-        paths = [line.strip() for line in f]
+    store = None
+    if text_store_dir:
+        store = TextStoreWriter(text_store_dir, unit)
 
-    for path in paths:
-        if os.path.exists(path):
-            kws = extract_keywords_from_file(path)
+    no_text = 0
+    try:
+        for path in paths:
+            _check_cancelled()
+            if path in skip or not os.path.exists(path):
+                continue
+            extractor = find_extractor(path, formats)
+            if extractor is None:
+                no_text += 1
+                continue
+            kws, term_pages, doc_forms, text, empty = index_chunks(
+                iter_text(path, formats),
+                top_n,
+                page_level and extractor.paged,
+                page_top_n=page_top_n,
+                keep_text=store is not None,
+            )
+            if ocr is not None and extractor.extract is iter_pdf_pages:
+                scanned = image_only_pages(path, empty)
+                if scanned:
+                    ocr_jobs.append((path, scanned))
+                    continue
             if kws:
                 result[path] = kws
-    return result
+                merge_forms(forms, doc_forms)
+                if term_pages:
+                    pages_result[path] = term_pages
+                if store is not None:
+                    # Form feeds keep page boundaries recoverable for snippets.
+                    store.add(path, text)
+            else:
+                no_text += 1
+    finally:
+        if store is not None:
+            store.close()
+
+    if no_text:
+        logger.info(f"{unit}: {no_text} file(s) had no extractable text")
+    return unit, result, pages_result, ocr_jobs, forms
+
+
+def process_ocr_document(
+    path,
+    scanned,
+    top_n=None,
+    page_level=False,
+    ocr=None,
+    page_top_n=PAGE_TOP_KEYWORDS,
+    keep_text=False,
+):
+    """
+    OCR the scanned pages of a PDF and index the whole document.
+
+    Returns ``(path, keywords, page hits or None, text or None, forms)``.
+    """
+    _check_cancelled()
+    try:
+        texts = ocr_pdf_pages(path, scanned, ocr.cache_dir, ocr.language, ocr.dpi)
+    except Exception as e:
+        logger.error(f"OCR failed for {path}: {e}")
+        texts = {}
+    pages = (texts.get(i, page) for i, page in enumerate(iter_text(path)))
+    kws, term_pages, forms, text, _ = index_chunks(
+        pages, top_n, page_level, page_top_n=page_top_n, keep_text=keep_text
+    )
+    return path, kws, term_pages, text, forms
+
+
+def _units(batch_files, chunk_size):
+    """Split batch files into ``(unit name, paths)`` chunks of ``chunk_size`` files."""
+    units = []
+    for batch_file in batch_files:
+        if not os.path.exists(batch_file):
+            logger.error(f"Batch file not found: {batch_file}")
+            continue
+        paths = read_batch(batch_file)
+        stem = Path(batch_file).stem
+        for i in range(0, len(paths), chunk_size):
+            units.append((f"{stem}-{i // chunk_size:05d}", paths[i : i + chunk_size]))
+    return units
+
+
+def process_all_batches(
+    batch_files,
+    top_n,
+    text_store_dir=None,
+    page_level=False,
+    ocr=None,
+    dedup=False,
+    checkpoint_dir=None,
+    chunk_size=CHECKPOINT_INTERVAL,
+    should_cancel=None,
+    progress=None,
+    builder=None,
+    forms=None,
+    page_top_n=PAGE_TOP_KEYWORDS,
+    formats=None,
+):
+    """
+    Index all batches in parallel.
+
+    Returns ``(keywords, pages, duplicates)``: keywords and page hits by
+    path, and ``{indexed path: [identical copies]}``. Each document keeps
+    its top ``top_n`` terms and, with ``page_level``, the top ``page_top_n``
+    terms of each of its pages (see ``page_keywords``). Only files in one of
+    ``formats`` (extensions, e.g. SUPPORTED_FORMATS) are indexed, or all
+    registered formats if None. With ``dedup``, files
+    with identical content are found up front and only the first copy is
+    extracted and indexed.
+
+    Batches are split into units of ``chunk_size`` files. With a
+    ``checkpoint_dir``, every finished unit is journaled there, and a later
+    call with the same inputs resumes from it. Remove the checkpoint once
+    the index is saved (``save_index_records`` does so when publishing). A
+    checkpoint whose ``text_store_dir`` has gone is not resumed, since the
+    text of its finished units is lost. ``should_cancel`` is polled
+    while waiting. When it returns True, the workers stop after their
+    current document and IndexingCancelled is raised.
+
+    With ``ocr`` settings, scanned PDFs found by the workers are handed to a
+    separate, smaller pool running at lower priority as soon as their unit
+    finishes.
+
+    With an ExternalIndexBuilder as ``builder``, documents are streamed into
+    it as they finish instead of being collected. The returned keywords and
+    pages are then empty, and ``builder.finish()`` produces the index.
+
+    A ``forms`` dict, if given, is filled with ``{term: {original word:
+    number of documents}}`` so that terms can be shown as real words (e.g.
+    for autocomplete).
+    """
+    units = _units(batch_files, chunk_size)
+    all_paths = [p for _, paths in units for p in paths]
+    settings = dict(
+        top_n=top_n, page_level=page_level, ocr=ocr is not None, dedup=dedup,
+        text_store_dir=text_store_dir, chunk_size=chunk_size, page_top_n=page_top_n,
+        formats=sorted(formats) if formats is not None else None,
+        # Journaled terms were normalized and capped by the run that wrote them
+        normalizer=normalizer_settings(load_config()), max_chars=MAX_KEYWORD_CHARS,
+    )
+    if formats is not None:
+        for ext in unsupported_formats(formats):
+            logger.warning(f"No extractor is registered for {ext}; those files are skipped")
+
+    D, P = {}, {}
+    if builder is not None:
+        add_document = builder.add
+    else:
+
+        def add_document(path, kws, term_pages):
+            D[path] = kws
+            if term_pages:
+                P[path] = term_pages
+
+    checkpoint = None
+    resumed = False
+    if checkpoint_dir:
+        checkpoint = Checkpoint(
+            checkpoint_dir, run_fingerprint(all_paths, settings), on_document=add_document
+        )
+        if text_store_dir and has_checkpoint(checkpoint_dir) and not Path(text_store_dir).exists():
+            logger.warning("Text store of the checkpointed run is gone; starting over")
+        else:
+            resumed = checkpoint.resume()
+
+    if forms is None:
+        forms = {}
+    if resumed:
+        duplicates = checkpoint.duplicates
+        pending_ocr = list(checkpoint.ocr_jobs.items())
+        merge_forms(forms, checkpoint.forms)
+    else:
+        if text_store_dir:
+            clear_text_store(text_store_dir)
+        duplicates = {}
+        if dedup:
+            duplicates = find_duplicates(all_paths)
+        if checkpoint is not None:
+            checkpoint.start(duplicates)
+        pending_ocr = []
+
+    skip = frozenset(p for copies in duplicates.values() for p in copies)
+    if skip:
+        logger.info(f"Deduplication: skipping {len(skip)} duplicate file(s)")
+    todo = [unit for unit in units if checkpoint is None or unit[0] not in checkpoint.done_units]
+
+    options = dict(top_n=top_n, page_level=page_level, ocr=ocr, page_top_n=page_top_n)
+    worker = partial(
+        process_paths, text_store_dir=text_store_dir, skip=skip, formats=formats, **options
+    )
+
+    cancel_event = multiprocessing.Event()
+    executor = concurrent.futures.ProcessPoolExecutor(
+        initializer=_init_worker, initargs=(cancel_event,)
+    )
+    ocr_executor = None
+    if ocr is not None:
+        ocr_executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=ocr.processes, initializer=_init_worker, initargs=(cancel_event, True)
+        )
+    ocr_store = None
+
+    def submit_ocr(path, scanned):
+        return ocr_executor.submit(
+            process_ocr_document, path, scanned, keep_text=bool(text_store_dir), **options
+        )
+
+    pending = {executor.submit(worker, unit, paths): "unit" for unit, paths in todo}
+    pending.update({submit_ocr(path, scanned): "ocr" for path, scanned in pending_ocr})
+    total_units = len(units)
+    done_units = total_units - len(todo)
 
+    try:
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=CANCEL_POLL_SECONDS,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            if should_cancel is not None and should_cancel():
+                cancel_event.set()
+                raise IndexingCancelled()
 
-def refine_keywords(data, top_n):
-    for k, v in data.items():
-        c = Counter(v)
-        top_values = [w for w, _ in c.most_common(top_n)]
-        data[k] = list(set(top_values))
-    return data
+            for future in done:
+                kind = pending.pop(future)
+                if kind == "unit":
+                    unit, res, pages, ocr_jobs, unit_forms = future.result()
+                    for path, kws in res.items():
+                        add_document(path, kws, pages.get(path))
+                    merge_forms(forms, unit_forms)
+                    if checkpoint is not None:
+                        checkpoint.record_unit(unit, res, pages, ocr_jobs, unit_forms)
+                    for path, scanned in ocr_jobs:
+                        pending[submit_ocr(path, scanned)] = "ocr"
+                    done_units += 1
+                    if progress is not None:
+                        progress(done_units, total_units)
+                else:
+                    path, kws, term_pages, text, doc_forms = future.result()
+                    if kws:
+                        add_document(path, kws, term_pages)
+                        merge_forms(forms, doc_forms)
+                        if text_store_dir:
+                            if ocr_store is None:
+                                shard = f"ocr-{int(time.time())}"
+                                ocr_store = TextStoreWriter(text_store_dir, shard)
+                            ocr_store.add(path, text)
+                            ocr_store.flush()
+                    if checkpoint is not None:
+                        checkpoint.record_ocr(path, kws, term_pages, doc_forms)
+    except BaseException:
+        cancel_event.set()
+        raise
+    finally:
+        # When stopping early, drop queued units and don't wait for the
+        # running ones; they stop after their current document.
+        stopping = cancel_event.is_set()
+        executor.shutdown(wait=not stopping, cancel_futures=stopping)
+        if ocr_executor is not None:
+            ocr_executor.shutdown(wait=not stopping, cancel_futures=stopping)
+        if ocr_store is not None:
+            ocr_store.close()
+        if checkpoint is not None:
+            checkpoint.close()
 
+    if text_store_dir:
+        build_lookup(text_store_dir)
 
-def process_all_batches(batch_files, top_n):
-    D = {}
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        results = list(executor.map(process_batch, batch_files))
-    for res in results:
-        D.update(res)
-    return refine_keywords(D, top_n)
+    if builder is not None:
+        return D, P, duplicates  # builder.finish() drops unindexed canonicals
+    duplicates = {path: copies for path, copies in duplicates.items() if path in D}
+    return D, P, duplicates
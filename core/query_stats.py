@@ -0,0 +1,158 @@
+# core/query_stats.py
+import json
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from core.config import load_config
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+slow_logger = setup_logger("slow_queries", "slow_queries.log")
+
+TRACE_FIELDS = ("query", "parse_ms", "candidates", "scoring_ms", "total_ms", "cache_hit", "time")
+
+
+class QueryTrace:
+    """Timings of one query, filled in while it runs."""
+
+    __slots__ = TRACE_FIELDS + ("_started",)
+
+    def __init__(self, query):
+        self.query = query
+        self.parse_ms = 0.0
+        self.candidates = 0
+        self.scoring_ms = 0.0
+        self.total_ms = 0.0
+        self.cache_hit = None
+        self.time = time.time()
+        self._started = time.perf_counter()
+
+    def parsed(self):
+        self.parse_ms = (time.perf_counter() - self._started) * 1000
+
+    def scored(self, candidates, scoring_ms, cache_hit=None):
+        self.candidates = candidates
+        self.scoring_ms = scoring_ms
+        self.cache_hit = cache_hit
+
+    def finish(self, stats=None):
+        """Stop the clock and record the trace (in the process-wide stats by default)."""
+        self.total_ms = (time.perf_counter() - self._started) * 1000
+        (stats or get_query_stats()).record(self)
+        return self
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in TRACE_FIELDS}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list (0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class QueryStats:
+    """
+    Bounded ring buffer of recent query traces with percentile summaries.
+
+    Queries slower than ``slow_ms`` are also written to the slow-query log
+    (``logs/slow_queries.log``).
+    """
+
+    def __init__(self, capacity=1000, slow_ms=500):
+        self.slow_ms = slow_ms
+        self._traces = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(capacity=cfg["QUERY_STATS_SIZE"], slow_ms=cfg["SLOW_QUERY_MS"])
+
+    def record(self, trace):
+        with self._lock:
+            self._traces.append(trace.to_dict())
+        if self.slow_ms and trace.total_ms >= self.slow_ms:
+            slow_logger.warning(
+                f"Slow query ({trace.total_ms:.1f} ms): {trace.query!r} "
+                f"parse={trace.parse_ms:.1f} ms candidates={trace.candidates} "
+                f"scoring={trace.scoring_ms:.1f} ms cache_hit={trace.cache_hit}"
+            )
+
+    def traces(self):
+        with self._lock:
+            return list(self._traces)
+
+    def last(self):
+        with self._lock:
+            return self._traces[-1] if self._traces else None
+
+    def summary(self):
+        """Percentiles and averages over the buffered traces."""
+        traces = self.traces()
+        count = len(traces)
+        totals = sorted(t["total_ms"] for t in traces)
+        known = [t["cache_hit"] for t in traces if t["cache_hit"] is not None]
+        return {
+            "queries": count,
+            "p50_ms": percentile(totals, 50),
+            "p90_ms": percentile(totals, 90),
+            "p99_ms": percentile(totals, 99),
+            "max_ms": totals[-1] if totals else 0.0,
+            "mean_parse_ms": sum(t["parse_ms"] for t in traces) / count if count else 0.0,
+            "mean_scoring_ms": sum(t["scoring_ms"] for t in traces) / count if count else 0.0,
+            "mean_candidates": sum(t["candidates"] for t in traces) / count if count else 0.0,
+            "cache_hit_rate": sum(known) / len(known) if known else 0.0,
+            "slow_queries": sum(1 for t in totals if self.slow_ms and t >= self.slow_ms),
+        }
+
+    def save(self, path):
+        """Write the buffered traces to ``path`` (e.g. for the ``stats`` command)."""
+        from core.index_manager import atomic_write_json
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(path, {"slow_ms": self.slow_ms, "traces": self.traces()})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        stats = cls(capacity=max(len(data["traces"]), 1), slow_ms=data["slow_ms"])
+        stats._traces.extend(data["traces"])
+        return stats
+
+
+def format_summary(stats, slowest=10):
+    """Human-readable report of a QueryStats buffer."""
+    s = stats.summary()
+    lines = [
+        f"Queries:          {s['queries']}",
+        f"Latency p50/p90/p99/max: {s['p50_ms']:.1f} / {s['p90_ms']:.1f} / "
+        f"{s['p99_ms']:.1f} / {s['max_ms']:.1f} ms",
+        f"Mean parse:       {s['mean_parse_ms']:.1f} ms",
+        f"Mean scoring:     {s['mean_scoring_ms']:.1f} ms",
+        f"Mean candidates:  {s['mean_candidates']:.0f}",
+        f"Cache hit rate:   {s['cache_hit_rate']:.0%}",
+        f"Slow (>= {stats.slow_ms} ms): {s['slow_queries']}",
+    ]
+    worst = sorted(stats.traces(), key=lambda t: t["total_ms"], reverse=True)[:slowest]
+    if worst:
+        lines.append("Slowest queries:")
+        for t in worst:
+            lines.append(f"  {t['total_ms']:>8.1f} ms  {t['candidates']:>7} candidates  {t['query']!r}")
+    return "\n".join(lines)
+
+
+_default = None
+
+
+def get_query_stats():
+    """Return the process-wide QueryStats configured from config.json."""
+    global _default
+    if _default is None:
+        _default = QueryStats.from_config(load_config())
+    return _default
@@ -1,15 +1,305 @@
-from core.keyword_extraction import rake_keywords
+import heapq
+import time
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
 
+from core.compact_index import CompactIndex
+from core.fuzzy import get_matcher
+from core.keyword_extraction import extract_terms
+from core.query_stats import QueryTrace
 
-def search(query, index_data):
+FUZZY_MAX_DISTANCE = 1
+FUZZY_PENALTY = 0.5
+FUZZY_MIN_LENGTH = 4
+FUZZY_MAX_EXPANSIONS = 5
+MAX_RESULT_PAGES = 3
+PAGE_SIZE = 200
+SCORE_CACHE_SIZE = 16
+CACHED_RESULTS = 1000
+
+# pages: best-matching page numbers (1-based), empty for unpaged documents
+# duplicates: other paths with identical content, collapsed into this result
+SearchResult = namedtuple("SearchResult", ["path", "score", "pages", "duplicates"])
+
+
+def expand_terms(
+    query_kws,
+    index_data,
+    max_distance=FUZZY_MAX_DISTANCE,
+    penalty=FUZZY_PENALTY,
+    min_length=FUZZY_MIN_LENGTH,
+    max_expansions=FUZZY_MAX_EXPANSIONS,
+):
+    """
+    Map query keywords to ``[(vocabulary term, weight), ...]``.
+
+    Terms present in the index match exactly with weight 1. Unknown terms
+    are expanded to the closest vocabulary terms within ``max_distance``
+    edits, each weighted ``penalty ** distance``.
+    """
+    expanded = []
+    matcher = None
+    for kw in query_kws:
+        if kw in index_data.term_ids or max_distance < 1:
+            expanded.append([(kw, 1.0)])
+            continue
+        if matcher is None:
+            matcher = get_matcher(index_data, max_distance, min_length)
+        matches = matcher.lookup(kw)[:max_expansions]
+        expanded.append([(term, penalty**distance) for term, distance in matches])
+    return expanded
+
+
+def _score_documents(expanded, index_data, max_pages):
+    """
+    Score documents for already expanded query terms (see ``expand_terms``).
+
+    Returns ``({doc id: score}, {doc id: best pages})``. Documents indexed
+    page by page are scored at page level too: the best page's score is
+    added to the document score, so documents whose matches sit together on
+    one page rank above ones where they are scattered. Other documents count
+    as a single page.
+    """
+    scores = {}
+    matched = {}
+
+    for alternatives in expanded:
+        # A document matching several spellings of one query term only
+        # counts the best one.
+        best = {}
+        for term, weight in alternatives:
+            for doc_id in index_data.doc_ids(term):
+                if weight > best.get(doc_id, (0, None))[0]:
+                    best[doc_id] = (weight, term)
+        for doc_id, (weight, term) in best.items():
+            scores[doc_id] = scores.get(doc_id, 0) + weight
+            matched.setdefault(doc_id, []).append((term, weight))
+
+    best_pages = {}
+    for doc_id, weighted_terms in matched.items():
+        page_scores = index_data.page_scores(doc_id, weighted_terms)
+        if page_scores:
+            pages = sorted(page_scores, key=lambda p: (-page_scores[p], p))[:max_pages]
+            scores[doc_id] += page_scores[pages[0]]
+            best_pages[doc_id] = pages
+        else:
+            scores[doc_id] *= 2
+    return scores, best_pages
+
+
+_score_caches = weakref.WeakKeyDictionary()
+
+
+def _sort_keys(scores, shard, n=None):
+    """The ``n`` best ``(-score, shard, doc id)`` sort keys (all if None), in order."""
+    keys = ((-score, shard, doc_id) for doc_id, score in scores.items())
+    return sorted(keys) if n is None else heapq.nsmallest(n, keys)
+
+
+def _cached_ranking(expanded, index_data, max_pages, shard=0, trace=None):
+    """
+    ``(total matches, best sort keys, {doc id: best pages})`` for a query,
+    behind a small per-index LRU cache.
+
+    Fetching the next page of results reruns the query with a cursor, so
+    scoring is done once per query rather than once per page. Only the
+    ``CACHED_RESULTS`` best sort keys and their pages are kept, so an entry
+    stays small however many documents match; callers rescore for rows
+    further down. Entries are dropped when documents are added to the
+    index. Timings, candidate count and whether the cache was hit are
+    recorded on ``trace`` if given.
+    """
+    started = time.perf_counter()
+    key = (tuple(tuple(alternatives) for alternatives in expanded), max_pages, shard)
+    cache = _score_caches.get(index_data)
+    if cache is None or cache.size != len(index_data):
+        cache = OrderedDict()
+        cache.size = len(index_data)
+        _score_caches[index_data] = cache
+
+    entry = cache.get(key)
+    hit = entry is not None
+    if hit:
+        cache.move_to_end(key)
+    else:
+        scores, best_pages = _score_documents(expanded, index_data, max_pages)
+        keys = _sort_keys(scores, shard, CACHED_RESULTS)
+        pages = {k[2]: best_pages[k[2]] for k in keys if k[2] in best_pages}
+        entry = (len(scores), keys, pages)
+        cache[key] = entry
+        if len(cache) > SCORE_CACHE_SIZE:
+            cache.popitem(last=False)
+    if trace is not None:
+        trace.scored(entry[0], (time.perf_counter() - started) * 1000, hit)
+    return entry
+
+
+def _result(index_data, doc_id, score, best_pages):
+    return SearchResult(
+        index_data.path(doc_id),
+        score,
+        best_pages.get(doc_id, []),
+        index_data.duplicates(doc_id),
+    )
+
+
+def _rows(index_data, keys, best_pages):
+    return [(key, _result(index_data, key[2], -key[0], best_pages)) for key in keys]
+
+
+def rank_top(
+    expanded, index_data, max_pages=MAX_RESULT_PAGES, top_k=None, shard=0, trace=None
+):
+    """
+    Return ``(total matches, [(sort key, SearchResult)])`` for the best
+    ``top_k`` documents (all if None), ordered by sort key as in
+    ``rank_page``.
+    """
+    total, keys, best_pages = _cached_ranking(expanded, index_data, max_pages, shard, trace)
+    if len(keys) < total and (top_k is None or top_k > len(keys)):
+        # Deeper than the cached top of the ranking: score again
+        scores, best_pages = _score_documents(expanded, index_data, max_pages)
+        keys = _sort_keys(scores, shard, top_k)
+    return total, _rows(index_data, keys[:top_k], best_pages)
+
+
+def rank_documents(expanded, index_data, max_pages=MAX_RESULT_PAGES, top_k=None, trace=None):
+    """Return the best ``top_k`` documents (all if None) as SearchResult."""
+    _, rows = rank_top(expanded, index_data, max_pages, top_k, trace=trace)
+    return [result for _, result in rows]
+
+
+def rank_page(
+    expanded,
+    index_data,
+    limit=PAGE_SIZE,
+    cursor=None,
+    max_pages=MAX_RESULT_PAGES,
+    shard=0,
+    trace=None,
+):
+    """
+    Return ``(total matches, offset, [(sort key, SearchResult)])`` for the
+    ``limit`` best documents that rank after ``cursor``; ``offset`` is the
+    number of matches up to and including the cursor.
+
+    Results are ordered by the sort key ``(-score, shard, doc id)``. This is
+    a total order, so a page boundary falls in the same place however often
+    the query is rerun. A cursor is the sort key of the last row already
+    shown. Only the rows of the requested page are turned into
+    SearchResults.
+    """
+    total, keys, best_pages = _cached_ranking(expanded, index_data, max_pages, shard, trace)
+    offset = 0 if cursor is None else bisect_right(keys, tuple(cursor))
+    if offset + limit <= len(keys) or len(keys) == total:
+        return total, offset, _rows(index_data, keys[offset : offset + limit], best_pages)
+
+    # Past the cached top of the ranking: score again
+    scores, best_pages = _score_documents(expanded, index_data, max_pages)
+    keys = ((-score, shard, doc_id) for doc_id, score in scores.items())
+    if cursor is not None:
+        cursor = tuple(cursor)
+        keys = [key for key in keys if key > cursor]
+        offset = total - len(keys)
+    return total, offset, _rows(index_data, heapq.nsmallest(limit, keys), best_pages)
+
+
+def page_results(rows, offset, total):
+    """
+    Turn ``rank_page`` rows into ``(results, next cursor or None, total)``.
+    The cursor is None once ``offset`` plus these rows cover every match.
+    """
+    results = [result for _, result in rows]
+    next_cursor = rows[-1][0] if rows and offset + len(rows) < total else None
+    return results, next_cursor, total
+
+
+def search_results(
+    query,
+    index_data,
+    max_distance=FUZZY_MAX_DISTANCE,
+    penalty=FUZZY_PENALTY,
+    normalizer=None,
+    max_pages=MAX_RESULT_PAGES,
+    top_k=None,
+):
+    """
+    Rank documents for ``query`` and return a list of SearchResult.
+
+    Timings are recorded in the process-wide query stats (see
+    ``core.query_stats``).
+    """
     if not query.strip():
         return []
-    query_kws = rake_keywords(query)
-    scores = {}
+    if not isinstance(index_data, CompactIndex):
+        index_data = CompactIndex.from_dict(index_data)
 
-    for kw in query_kws:
-        for path, kws in index_data.items():
-            if kw in kws:
-                scores[path] = scores.get(path, 0) + 1
+    trace = QueryTrace(query)
+    query_kws = extract_terms(query, normalizer)
+    expanded = expand_terms(query_kws, index_data, max_distance, penalty)
+    trace.parsed()
+    results = rank_documents(expanded, index_data, max_pages, top_k, trace)
+    trace.finish()
+    return results
+
+
+def search_page(
+    query,
+    index_data,
+    limit=PAGE_SIZE,
+    cursor=None,
+    max_distance=FUZZY_MAX_DISTANCE,
+    penalty=FUZZY_PENALTY,
+    normalizer=None,
+    max_pages=MAX_RESULT_PAGES,
+):
+    """
+    One page of results for ``query``: ``(results, next cursor, total)``.
+
+    Pass the returned cursor back to get the following page. It is None once
+    the last page has been returned. Timings of the first page (no cursor)
+    are recorded like ``search_results``; fetching further pages of the same
+    query does not count as another query.
+    """
+    if not query.strip():
+        return [], None, 0
+    if not isinstance(index_data, CompactIndex):
+        index_data = CompactIndex.from_dict(index_data)
 
-    return sorted(scores, key=scores.get, reverse=True)
+    trace = QueryTrace(query)
+    query_kws = extract_terms(query, normalizer)
+    expanded = expand_terms(query_kws, index_data, max_distance, penalty)
+    trace.parsed()
+    total, offset, rows = rank_page(
+        expanded, index_data, limit, cursor, max_pages, trace=trace
+    )
+    if cursor is None:
+        trace.finish()
+    return page_results(rows, offset, total)
+
+
+def search(
+    query,
+    index_data,
+    max_distance=FUZZY_MAX_DISTANCE,
+    penalty=FUZZY_PENALTY,
+    normalizer=None,
+):
+    results = search_results(query, index_data, max_distance, penalty, normalizer)
+    return [result.path for result in results]
+
+
+def query_terms(
+    query,
+    index_data,
+    max_distance=FUZZY_MAX_DISTANCE,
+    penalty=FUZZY_PENALTY,
+    normalizer=None,
+):
+    """Vocabulary terms a query matches, exactly or fuzzily (e.g. for highlighting)."""
+    if not query.strip():
+        return set()
+    query_kws = extract_terms(query, normalizer)
+    expanded = expand_terms(query_kws, index_data, max_distance, penalty)
+    return {term for alternatives in expanded for term, _ in alternatives}
@@ -0,0 +1,263 @@
+# core/sharding.py
+import heapq
+import multiprocessing
+import time
+import zlib
+from itertools import islice
+
+from core.compact_index import CompactIndex
+from core.keyword_extraction import extract_terms
+from core.logger import setup_logger
+from core.query_stats import QueryTrace
+from core.search_engine import (
+    FUZZY_MAX_DISTANCE, FUZZY_PENALTY, MAX_RESULT_PAGES, PAGE_SIZE, expand_terms,
+    page_results, rank_page, rank_top
+)
+
+logger = setup_logger(__name__)
+
+SHARD_TIMEOUT = 10.0  # seconds to wait for every shard's reply
+
+
+def shard_of(path, num_shards):
+    """Stable shard number for a document path (the same in every process)."""
+    return zlib.crc32(path.encode("utf-8", errors="surrogateescape")) % num_shards
+
+
+def partition_index(index, num_shards):
+    """Split a CompactIndex into ``num_shards`` CompactIndexes by path hash."""
+    keywords = [[] for _ in range(len(index))]
+    for term, docs in zip(index.terms, index.postings):
+        for doc_id in docs:
+            keywords[doc_id].append(term)
+
+    shards = [CompactIndex() for _ in range(num_shards)]
+    for doc_id, kws in enumerate(keywords):
+        path = index.path(doc_id)
+        shards[shard_of(path, num_shards)].add_document(
+            path, kws, index.term_pages(doc_id), index.duplicates(doc_id)
+        )
+        keywords[doc_id] = None
+    return shards
+
+
+class Vocabulary:
+    """
+    What the coordinator keeps of an index once it is sharded: the terms,
+    for parsing and fuzzy-expanding queries, plus the document count,
+    generation and text store location. Postings, paths and page hits live
+    only in the shard processes.
+    """
+
+    def __init__(self, index):
+        self.terms = index.terms
+        self.term_ids = index.term_ids
+        self.generation = index.generation
+        self.text_store_dir = index.text_store_dir
+        self._size = len(index)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+
+def _serve_shard(conn, shard_no):
+    """
+    Shard process: receive the shard's CompactIndex, then answer
+    ``("rank", expanded, max_pages, top_k)`` (see ``rank_top``) and
+    ``("page", expanded, limit, cursor, max_pages)`` requests until closed.
+    """
+    try:
+        shard = conn.recv()
+    except (EOFError, OSError):
+        return
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):  # the coordinator went away
+            break
+        if request is None:
+            break
+        kind, expanded, *args = request
+        try:
+            if kind == "page":
+                limit, cursor, max_pages = args
+                conn.send(rank_page(expanded, shard, limit, cursor, max_pages, shard_no))
+            else:
+                max_pages, top_k = args
+                conn.send(rank_top(expanded, shard, max_pages, top_k, shard_no))
+        except Exception as e:
+            conn.send(e)
+    conn.close()
+
+
+class ShardedSearcher:
+    """
+    Query coordinator over shard processes.
+
+    The index is partitioned by path hash and each partition is held by its
+    own process, so scoring runs in parallel outside the GIL. The
+    coordinator keeps only the ``vocabulary``: a query is parsed and
+    fuzzily expanded once against it, sent to every shard over a pipe, and
+    the shards' top-k lists are merged.
+
+    Partitioning and starting the shards takes a while for a large index,
+    so create the searcher off the GUI thread; the caller can drop its own
+    reference to the full index afterwards. If a shard fails or does not
+    answer within ``timeout`` seconds, the shards are stopped and searches
+    run in-process on the index returned by ``reload()`` (e.g. reading it
+    back from disk).
+    """
+
+    def __init__(self, index, num_shards, reload=None, timeout=SHARD_TIMEOUT):
+        self.vocabulary = Vocabulary(index)
+        self.num_shards = num_shards
+        self.reload = reload
+        self.timeout = timeout
+        self._index = None  # in-process fallback, loaded on first need
+        self._shards = []
+        # spawn, not fork: the coordinator is usually a multithreaded GUI process
+        context = multiprocessing.get_context("spawn")
+        partitions = partition_index(index, num_shards)
+        for shard_no in range(num_shards):
+            conn, child = context.Pipe()
+            process = context.Process(target=_serve_shard, args=(child, shard_no), daemon=True)
+            process.start()
+            child.close()
+            self._shards.append((process, conn))
+        # Sent over the pipes rather than as Process arguments, which the
+        # coordinator would keep referencing
+        for shard_no, (_, conn) in enumerate(self._shards):
+            conn.send(partitions[shard_no])
+            partitions[shard_no] = None
+        logger.info(f"Started {num_shards} search shard(s) for {len(index)} document(s)")
+
+    def _local_index(self):
+        """The index to search in-process once the shards are gone."""
+        if self._index is None:
+            if self.reload is None:
+                raise RuntimeError("Search shards are unavailable and there is no index to reload")
+            self._index = self.reload()
+            logger.info(f"Loaded {len(self._index)} document(s) for in-process search")
+        return self._index
+
+    def search_results(
+        self,
+        query,
+        max_distance=FUZZY_MAX_DISTANCE,
+        penalty=FUZZY_PENALTY,
+        normalizer=None,
+        max_pages=MAX_RESULT_PAGES,
+        top_k=None,
+    ):
+        """
+        The documents and scores ``search_engine.search_results`` finds on
+        the full index. Documents with equal scores may come in another
+        order, since ties are broken by shard and shard-local doc id.
+        """
+        if not query.strip():
+            return []
+        trace = QueryTrace(query)
+        query_kws = extract_terms(query, normalizer)
+        expanded = expand_terms(query_kws, self.vocabulary, max_distance, penalty)
+        trace.parsed()
+        started = time.perf_counter()
+        replies = self._ask(("rank", expanded, max_pages, top_k))
+        if replies is None:
+            _, rows = rank_top(expanded, self._local_index(), max_pages, top_k, trace=trace)
+        else:
+            # Every shard's rows are sorted by the same kind of key
+            total = sum(shard_total for shard_total, _ in replies)
+            rows = heapq.merge(*(shard_rows for _, shard_rows in replies))
+            rows = list(rows if top_k is None else islice(rows, top_k))
+            # Scoring happens in the shards; count the whole fan-out as scoring
+            trace.scored(total, (time.perf_counter() - started) * 1000)
+        trace.finish()
+        return [result for _, result in rows]
+
+    def search_page(
+        self,
+        query,
+        limit=PAGE_SIZE,
+        cursor=None,
+        max_distance=FUZZY_MAX_DISTANCE,
+        penalty=FUZZY_PENALTY,
+        normalizer=None,
+        max_pages=MAX_RESULT_PAGES,
+    ):
+        """
+        Like ``search_engine.search_page`` (only the first page is recorded
+        as a query), with ties ordered as in ``search_results``. Every shard returns its own next ``limit`` rows
+        after the cursor, and the sorted replies are merged by sort key.
+        """
+        if not query.strip():
+            return [], None, 0
+        trace = QueryTrace(query)
+        query_kws = extract_terms(query, normalizer)
+        expanded = expand_terms(query_kws, self.vocabulary, max_distance, penalty)
+        trace.parsed()
+        started = time.perf_counter()
+        replies = self._ask(("page", expanded, limit, cursor, max_pages))
+        if replies is None:
+            index = self._local_index()
+            total, offset, rows = rank_page(
+                expanded, index, limit, cursor, max_pages, trace=trace
+            )
+        else:
+            total = sum(shard_total for shard_total, _, _ in replies)
+            offset = sum(shard_offset for _, shard_offset, _ in replies)
+            rows = list(islice(heapq.merge(*(shard_rows for _, _, shard_rows in replies)), limit))
+            trace.scored(total, (time.perf_counter() - started) * 1000)
+        if cursor is None:
+            trace.finish()
+        return page_results(rows, offset, total)
+
+    def _ask(self, request):
+        """
+        Send ``request`` to every shard; None means answer it in-process.
+
+        Replies are awaited with ``timeout``, so a hung shard cannot block
+        the caller (usually the GUI thread) for good.
+        """
+        if not self._shards:
+            return None
+        deadline = time.monotonic() + self.timeout
+        replies = []
+        try:
+            for _, conn in self._shards:
+                conn.send(request)
+            for _, conn in self._shards:
+                if not conn.poll(max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError(f"no reply within {self.timeout:g} s")
+                replies.append(conn.recv())
+        except (OSError, EOFError) as e:
+            logger.error(f"Search shard failed, searching in-process from now on: {e}")
+            self.close(wait=False)
+            return None
+        for reply in replies:
+            if isinstance(reply, Exception):
+                logger.error(f"Search shard error, searching in-process from now on: {reply}")
+                self.close(wait=False)
+                return None
+        return replies
+
+    def close(self, wait=True):
+        """
+        Stop the shard processes. Without ``wait`` they are killed at once,
+        for when one of them has stopped answering.
+        """
+        shards, self._shards = self._shards, []
+        for process, conn in shards:
+            if wait:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+            conn.close()
+        for process, _ in shards:
+            if wait:
+                process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
@@ -0,0 +1,84 @@
+# core/snippets.py
+import html
+import re
+
+from core.normalization import get_normalizer
+
+SNIPPET_CHARS = 240
+
+
+def _candidate_pattern(terms):
+    """
+    Regex for tokens that may normalize to one of ``terms``.
+
+    Stems are (almost always) prefixes of their surface forms, so only
+    tokens sharing a stem's leading characters are worth normalizing; this
+    keeps snippet extraction cheap even for very long documents.
+    """
+    prefixes = sorted({t[: max(3, len(t) - 1)] for t in terms if t}, key=len, reverse=True)
+    if not prefixes:
+        return None
+    alternatives = "|".join(re.escape(p) for p in prefixes)
+    return re.compile(rf"\b(?:{alternatives})\w*", re.IGNORECASE)
+
+
+def find_matches(text, terms, normalizer=None):
+    """Return ``[(start, end, term), ...]`` for tokens of ``text`` matching ``terms``."""
+    normalizer = normalizer or get_normalizer()
+    pattern = _candidate_pattern(terms)
+    if pattern is None:
+        return []
+    matches = []
+    for m in pattern.finditer(text):
+        term = normalizer.normalize_token(m.group())
+        if term in terms:
+            matches.append((m.start(), m.end(), term))
+    return matches
+
+
+def make_snippet(text, terms, normalizer=None, max_chars=SNIPPET_CHARS):
+    """
+    Build an HTML snippet of at most ``max_chars`` characters around the
+    densest cluster of query terms, with matches wrapped in ``<b>``.
+    """
+    if not text:
+        return ""
+    terms = set(terms)
+    matches = find_matches(text, terms, normalizer)
+    if not matches:
+        return html.escape(_collapse(text[:max_chars]))
+
+    # Slide a max_chars window over the matches and keep the one covering the
+    # most distinct terms (ties go to the earliest window).
+    best_start, best_count = 0, 0
+    left = 0
+    for right in range(len(matches)):
+        while matches[right][1] - matches[left][0] > max_chars:
+            left += 1
+        count = len({m[2] for m in matches[left : right + 1]})
+        if count > best_count:
+            best_start, best_count = left, count
+
+    first = matches[best_start][0]
+    start = max(0, first - max_chars // 4)
+    if start > 0:
+        space = text.find(" ", start, first)
+        if space != -1:
+            start = space + 1
+    end = min(len(text), start + max_chars)
+
+    parts = ["…" if start > 0 else ""]
+    pos = start
+    for m_start, m_end, _ in matches:
+        if m_start < start or m_end > end:
+            continue
+        parts.append(html.escape(_collapse(text[pos:m_start])))
+        parts.append(f"<b>{html.escape(text[m_start:m_end])}</b>")
+        pos = m_end
+    parts.append(html.escape(_collapse(text[pos:end])))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
+
+
+def _collapse(s):
+    return re.sub(r"\s+", " ", s)
@@ -1,24 +1,221 @@
 # core/text_extraction.py
-import fitz
-from docx import Document
+import io
+import posixpath
+import zipfile
+from collections import namedtuple
+from html.parser import HTMLParser
+from pathlib import Path
+from xml.etree import ElementTree
 
 from core.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+CHUNK_SIZE = 64 * 1024
+
+# Format libraries (fitz, docx) are imported inside their extractors, so
+# importing the registry stays cheap and workers only load what they use.
+
+# extract(file_path) yields text chunks; for paged formats each chunk is one
+# page (or slide) and its position is the page number shown to users.
+Extractor = namedtuple("Extractor", ["name", "extract", "paged", "extensions"])
+
+_by_extension = {}
+_by_magic = []  # (bytes prefix or callable(path, head) -> bool, Extractor)
+
+
+def register_extractor(*extensions, magic=None, paged=False):
+    """
+    Register a streaming text extractor for the given file extensions.
+
+    ``magic`` is a bytes prefix (or a ``callable(path, head)``) used to
+    recognise files whose extension is missing or unknown.
+    """
+
+    def decorator(func):
+        extractor = Extractor(
+            func.__name__, func, paged, tuple(ext.lower() for ext in extensions)
+        )
+        for ext in extensions:
+            _by_extension[ext.lower()] = extractor
+        if magic is not None:
+            _by_magic.append((magic, extractor))
+        return func
+
+    return decorator
+
+
+def registered_formats():
+    return sorted(_by_extension)
+
+
+def unsupported_formats(formats):
+    """The entries of ``formats`` (e.g. SUPPORTED_FORMATS) no extractor handles."""
+    registered = set(registered_formats())
+    return sorted(ext for ext in formats if ext.lower() not in registered)
+
+
+def find_extractor(file_path, formats=None):
+    """
+    Return the Extractor for ``file_path`` by extension, then by magic bytes.
+
+    With ``formats`` (extensions such as ``".pdf"``), only those formats are
+    accepted: a file with another registered extension is skipped, and a
+    file recognised by magic bytes is kept only if its format is enabled.
+    """
+    allowed = None if formats is None else {ext.lower() for ext in formats}
+    suffix = Path(file_path).suffix.lower()
+    extractor = _by_extension.get(suffix)
+    if extractor is not None:
+        return extractor if allowed is None or suffix in allowed else None
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(16)
+    except OSError:
+        return None
+    for magic, extractor in _by_magic:
+        if allowed is not None and allowed.isdisjoint(extractor.extensions):
+            continue
+        if callable(magic):
+            if magic(file_path, head):
+                return extractor
+        elif head.startswith(magic):
+            return extractor
+    return None
+
+
+def iter_text(file_path, formats=None):
+    """
+    Yield the text of ``file_path`` chunk by chunk (nothing if unsupported,
+    or not among ``formats``, see ``find_extractor``).
+    """
+    extractor = find_extractor(file_path, formats)
+    if extractor is None:
+        return
+    try:
+        yield from extractor.extract(file_path)
+    except Exception as e:
+        logger.error(f"Error reading {file_path} with {extractor.name}: {e}")
+
+
+def _zip_with(member):
+    """Magic check for OOXML-style archives containing ``member``."""
+
+    def check(file_path, head):
+        if not head.startswith(b"PK\x03\x04"):
+            return False
+        try:
+            with zipfile.ZipFile(file_path) as zf:
+                return member in zf.namelist()
+        except zipfile.BadZipFile:
+            return False
+
+    return check
+
+
+def _zip_mimetype(mimetype):
+    """Magic check for ODF/EPUB archives, which start with a stored mimetype."""
+    marker = b"mimetype" + mimetype.encode("ascii")
+
+    def check(file_path, head):
+        if not head.startswith(b"PK\x03\x04"):
+            return False
+        with open(file_path, "rb") as f:
+            return marker in f.read(30 + len(marker) + 64)
+
+    return check
+
+
+def _xml_paragraphs(stream, tags):
+    """Stream an XML part and yield the text of every element named in ``tags``."""
+    for _, elem in ElementTree.iterparse(stream, events=("end",)):
+        if elem.tag.rsplit("}", 1)[-1] in tags:
+            text = "".join(elem.itertext())
+            elem.clear()
+            if text:
+                yield text
+
+
+def _batched(lines, size=CHUNK_SIZE):
+    """Group short strings into newline-joined chunks of about ``size`` chars."""
+    buf, length = [], 0
+    for line in lines:
+        buf.append(line)
+        length += len(line) + 1
+        if length >= size:
+            yield "\n".join(buf) + "\n"
+            buf, length = [], 0
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+class _HTMLText(HTMLParser):
+    """Collects visible text from HTML, skipping scripts and styles."""
+
+    SKIP = {"script", "style", "head", "noscript"}
+    BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+    def take(self):
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+def _html_chunks(read):
+    parser = _HTMLText()
+    while True:
+        data = read(CHUNK_SIZE)
+        if not data:
+            break
+        parser.feed(data)
+        text = parser.take()
+        if text.strip():
+            yield text
+    parser.close()
+    text = parser.take()
+    if text.strip():
+        yield text
+
+
+@register_extractor(".pdf", magic=b"%PDF-", paged=True)
+def iter_pdf_pages(file_path):
+    """Yield the text of each page of a PDF, in order."""
+    import fitz
 
-def extract_text_pdf(file_path):
-    text = ""
     try:
         with fitz.open(file_path) as pdf_document:
             for page in pdf_document:
-                text += page.get_text()
+                yield page.get_text()
     except Exception as e:
         logger.error(f"Error reading PDF {file_path}: {e}")
-    return text
+
+
+def extract_text_pdf(file_path):
+    return "".join(iter_pdf_pages(file_path))
 
 
 def extract_text_docx(file_path):
+    from docx import Document
+
     text = ""
     try:
         doc = Document(file_path)
@@ -26,3 +223,79 @@ def extract_text_docx(file_path):
     except Exception as e:
         logger.error(f"Error reading DOCX {file_path}: {e}")
     return text
+
+
+@register_extractor(".docx", magic=_zip_with("word/document.xml"))
+def iter_docx(file_path):
+    yield extract_text_docx(file_path)
+
+
+@register_extractor(".txt", ".md", ".markdown", ".rst", ".csv")
+def iter_plain_text(file_path):
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        yield from _batched(line.rstrip("\n") for line in f)
+
+
+@register_extractor(".html", ".htm", ".xhtml")
+def iter_html(file_path):
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        yield from _html_chunks(f.read)
+
+
+@register_extractor(".pptx", magic=_zip_with("ppt/presentation.xml"), paged=True)
+def iter_pptx_slides(file_path):
+    """Yield the text of each slide, in slide order."""
+    with zipfile.ZipFile(file_path) as zf:
+        slides = [
+            n for n in zf.namelist() if n.startswith("ppt/slides/slide") and n.endswith(".xml")
+        ]
+        slides.sort(key=lambda n: int("".join(c for c in n if c.isdigit()) or 0))
+        for name in slides:
+            with zf.open(name) as part:
+                yield "\n".join(_xml_paragraphs(part, {"p"})) + "\n"
+
+
+@register_extractor(".xlsx", magic=_zip_with("xl/workbook.xml"))
+def iter_xlsx(file_path):
+    """Yield shared strings and inline cell strings; numbers are not keywords."""
+    with zipfile.ZipFile(file_path) as zf:
+        names = zf.namelist()
+        if "xl/sharedStrings.xml" in names:
+            with zf.open("xl/sharedStrings.xml") as part:
+                yield from _batched(_xml_paragraphs(part, {"si"}))
+        for name in names:
+            if name.startswith("xl/worksheets/") and name.endswith(".xml"):
+                with zf.open(name) as part:
+                    yield from _batched(_xml_paragraphs(part, {"is"}))
+
+
+@register_extractor(".odt", ".odp", ".ods", magic=_zip_mimetype("application/vnd.oasis.opendocument"))
+def iter_odf(file_path):
+    with zipfile.ZipFile(file_path) as zf:
+        with zf.open("content.xml") as part:
+            yield from _batched(_xml_paragraphs(part, {"p", "h"}))
+
+
+@register_extractor(".epub", magic=_zip_mimetype("application/epub+zip"))
+def iter_epub(file_path):
+    """Yield the text of each chapter in reading (spine) order."""
+    with zipfile.ZipFile(file_path) as zf:
+        container = ElementTree.fromstring(zf.read("META-INF/container.xml"))
+        rootfile = next(e for e in container.iter() if e.tag.endswith("rootfile"))
+        opf_path = rootfile.get("full-path")
+        opf = ElementTree.fromstring(zf.read(opf_path))
+
+        manifest = {
+            e.get("id"): e.get("href") for e in opf.iter() if e.tag.endswith("}item")
+        }
+        spine = [e.get("idref") for e in opf.iter() if e.tag.endswith("}itemref")]
+        base = posixpath.dirname(opf_path)
+
+        for idref in spine:
+            href = manifest.get(idref)
+            if not href:
+                continue
+            name = posixpath.normpath(posixpath.join(base, href.split("#")[0]))
+            with zf.open(name) as part:
+                chapter = io.TextIOWrapper(part, encoding="utf-8", errors="replace")
+                yield from _html_chunks(chapter.read)
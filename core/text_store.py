@@ -0,0 +1,230 @@
+# core/text_store.py
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DATA_SUFFIX = ".bin"
+OFFSETS_SUFFIX = ".idx.json"
+
+# Lookup table written by build_lookup: sorted 64-bit path hashes, and for
+# each the (shard number, offset, length) of the document's text.
+LOOKUP_KEYS = "lookup.keys"
+LOOKUP_LOCATIONS = "lookup.locations"
+LOOKUP_SHARDS = "lookup.shards.json"
+LOOKUP_BUCKETS = 64
+_ENTRY = struct.Struct("=QQQQ")
+
+
+def path_key(path):
+    """64-bit hash of a document path, the lookup table's sort key."""
+    digest = hashlib.blake2b(path.encode("utf-8", errors="surrogateescape"), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+class TextStoreWriter:
+    """
+    Append-only writer for one shard of the text store.
+
+    Each document's text is zlib-compressed into ``<name>.bin`` and its
+    ``(offset, length)`` recorded in ``<name>.idx.json``, so any document can
+    be read back with a single seek. Every indexing worker writes its own
+    shard, which keeps the workers independent.
+    """
+
+    def __init__(self, store_dir, name, level=6):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.level = level
+        self.offsets = {}
+        self._data = open(self.store_dir / f"{name}{DATA_SUFFIX}", "wb")
+        self._pos = 0
+
+    def add(self, path, text):
+        blob = zlib.compress(text.encode("utf-8"), self.level)
+        self._data.write(blob)
+        self.offsets[path] = (self._pos, len(blob))
+        self._pos += len(blob)
+
+    def flush(self):
+        """Make everything added so far readable, even if the process dies later."""
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        offsets_file = self.store_dir / f"{self.name}{OFFSETS_SUFFIX}"
+        tmp = offsets_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.offsets, f)
+        os.replace(tmp, offsets_file)
+
+    def close(self):
+        if self._data.closed:
+            return
+        self.flush()
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_lookup(store_dir):
+    """
+    Write the lookup table of a finished text store.
+
+    Entries are spread over hash buckets on disk, then each bucket is
+    sorted in memory and appended to the table. Buckets are taken in hash
+    order, so the table comes out sorted, and only one bucket is held in
+    memory at a time. A missing ``store_dir`` gets an empty table.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    shards = []
+    count = 0
+    with tempfile.TemporaryDirectory(dir=store_dir) as tmp:
+        buckets = [open(Path(tmp) / f"{i:02d}", "wb") for i in range(LOOKUP_BUCKETS)]
+        try:
+            for offsets_file in sorted(store_dir.glob(f"*{OFFSETS_SUFFIX}")):
+                try:
+                    with open(offsets_file, "r", encoding="utf-8") as f:
+                        offsets = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error reading text store offsets {offsets_file}: {e}")
+                    continue
+                shard_no = len(shards)
+                shards.append(offsets_file.name[: -len(OFFSETS_SUFFIX)] + DATA_SUFFIX)
+                for path, (offset, length) in offsets.items():
+                    key = path_key(path)
+                    bucket = key * LOOKUP_BUCKETS >> 64
+                    buckets[bucket].write(_ENTRY.pack(key, shard_no, offset, length))
+        finally:
+            for bucket in buckets:
+                bucket.close()
+
+        with open(store_dir / LOOKUP_KEYS, "wb") as keys_out, open(
+            store_dir / LOOKUP_LOCATIONS, "wb"
+        ) as locations_out:
+            for i in range(LOOKUP_BUCKETS):
+                entries = list(_ENTRY.iter_unpack((Path(tmp) / f"{i:02d}").read_bytes()))
+                # Stable sort: a path stored twice keeps its last copy
+                entries.sort(key=lambda e: e[0])
+                keys, locations = array("Q"), array("Q")
+                for j, (key, shard_no, offset, length) in enumerate(entries):
+                    if j + 1 < len(entries) and entries[j + 1][0] == key:
+                        continue
+                    keys.append(key)
+                    locations.extend((shard_no, offset, length))
+                keys.tofile(keys_out)
+                locations.tofile(locations_out)
+                count += len(keys)
+
+    with open(store_dir / LOOKUP_SHARDS, "w", encoding="utf-8") as f:
+        json.dump(shards, f)
+    logger.info(f"Text store lookup built for {count} document(s) in {len(shards)} shard(s)")
+
+
+def _map_array(path):
+    """Memory-map a file of native 64-bit unsigned ints."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(array("Q"))
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("Q")
+
+
+class TextStore:
+    """
+    Random-access reader over all shards in a text store directory.
+
+    A store with a lookup table (see ``build_lookup``) is searched in place
+    through memory maps, so opening it costs nothing and no path strings are
+    held in memory. Older stores fall back to loading every shard's offsets.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        self._locations = None
+        self._keys = None
+
+    def _load(self):
+        self._locations = {}
+        if not self.store_dir.exists():
+            return
+        if (self.store_dir / LOOKUP_KEYS).exists():
+            try:
+                with open(self.store_dir / LOOKUP_SHARDS, "r", encoding="utf-8") as f:
+                    self._shards = json.load(f)
+                self._keys = _map_array(self.store_dir / LOOKUP_KEYS)
+                self._table = _map_array(self.store_dir / LOOKUP_LOCATIONS)
+                return
+            except (OSError, ValueError) as e:
+                logger.error(f"Error opening text store lookup in {self.store_dir}: {e}")
+                self._keys = None
+        for offsets_file in sorted(self.store_dir.glob(f"*{OFFSETS_SUFFIX}")):
+            shard = offsets_file.name[: -len(OFFSETS_SUFFIX)] + DATA_SUFFIX
+            try:
+                with open(offsets_file, "r", encoding="utf-8") as f:
+                    offsets = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading text store offsets {offsets_file}: {e}")
+                continue
+            for path, (offset, length) in offsets.items():
+                self._locations[path] = (shard, offset, length)
+
+    def _locate(self, path):
+        if self._locations is None:
+            self._load()
+        if self._keys is None:
+            return self._locations.get(path)
+        key = path_key(path)
+        i = bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return None
+        shard_no, offset, length = self._table[3 * i : 3 * i + 3]
+        return self._shards[shard_no], offset, length
+
+    def __contains__(self, path):
+        return self._locate(path) is not None
+
+    def get(self, path):
+        """Return the stored text of ``path``, or None if it was not stored."""
+        location = self._locate(path)
+        if location is None:
+            return None
+        shard, offset, length = location
+        try:
+            with open(self.store_dir / shard, "rb") as f:
+                f.seek(offset)
+                return zlib.decompress(f.read(length)).decode("utf-8")
+        except (OSError, zlib.error) as e:
+            logger.error(f"Error reading stored text for {path}: {e}")
+            return None
+
+
+def get_page(text, page):
+    """Return 1-based ``page`` of stored text (pages are separated by form feeds)."""
+    pages = text.split("\f")
+    if 1 <= page <= len(pages):
+        return pages[page - 1]
+    return text
+
+
+def clear_text_store(store_dir):
+    """Remove all shards so a fresh indexing run does not mix in stale text."""
+    store_dir = Path(store_dir)
+    if not store_dir.exists():
+        return
+    for pattern in (f"*{DATA_SUFFIX}", f"*{OFFSETS_SUFFIX}", "lookup.*"):
+        for f in store_dir.glob(pattern):
+            f.unlink()
@@ -1,32 +1,102 @@
 import subprocess
 import sys
+import threading
+import time
+from functools import partial
 from pathlib import Path
 
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QFont, QKeySequence
 from PyQt5.QtWidgets import (
-    QLineEdit, QListWidget, QPushButton, QVBoxLayout, 
+    QLineEdit, QListView, QPushButton, QVBoxLayout, 
     QWidget, QLabel, QHBoxLayout, QMessageBox, QShortcut
 )
 
+from core.compact_index import CompactIndex
+from core.config import load_config
+from core.index_manager import load_compact_index
 from core.logger import setup_logger
-from core.search_engine import search
-from gui.widgets import CustomCompleter
+from core.query_stats import get_query_stats
+from core.search_engine import query_terms, search_page
+from core.snippets import make_snippet
+from core.text_store import TextStore, get_page
+from gui.widgets import (
+    DUPLICATES_ROLE, PAGES_ROLE, SNIPPET_ROLE, CustomCompleter, ResultDelegate, ResultModel
+)
+from gui.threads import IndexingThread, SearchPreparationThread
 
 logger = setup_logger(__name__)
 
+# Budget for swapping in a re-built index: one frame at 60 Hz
+FRAME_MS = 1000 / 60
+
+
+def _close_in_background(searcher):
+    """Stop a searcher's shard processes without blocking the GUI thread."""
+    threading.Thread(target=searcher.close, daemon=True).start()
+
 
 class MyWidget(QWidget):
     """Main GUI window for lexical search engine."""
 
     def __init__(self, autocomplete_words, index_data):
         super().__init__()
+        self.cfg = load_config()
         self.index_data = index_data
         self.autocomplete_words = autocomplete_words
+        self.text_store = self._open_text_store(index_data)
+        self.searcher = None
+        self.indexing_thread = None
+        self._search_preps = []
+        self._pending_index = None  # re-built index being prepared for the swap
+        self._pending_words = None
+        self._highlight_terms = set()
         self.search_timer = QTimer()
         self.search_timer.setSingleShot(True)
         self.search_timer.timeout.connect(self._execute_search)
         self.initUI()
+        QTimer.singleShot(0, partial(self._prepare_search, index_data))
+
+    def _open_text_store(self, index_data):
+        """Read snippets from the text store published with this index generation."""
+        store_dir = getattr(index_data, "text_store_dir", None)
+        return TextStore(store_dir or self.cfg["TEXT_STORE_DIR"])
+
+    def _prepare_search(self, index):
+        """
+        Build the typo-tolerance index for ``index`` and, with
+        SEARCH_SHARDS > 1, start its shard processes in the background.
+        """
+        thread = SearchPreparationThread(
+            index,
+            self.cfg,
+            reload=partial(load_compact_index, self.cfg["OUTPUT_FILE"]),
+            parent=self,
+        )
+        thread.ready.connect(self._search_ready)
+        thread.finished.connect(partial(self._search_prep_finished, thread))
+        self._search_preps.append(thread)
+        thread.start()
+
+    def _search_prep_finished(self, thread):
+        self._search_preps.remove(thread)
+        thread.deleteLater()
+
+    def _search_ready(self, index, searchable, searcher, prepare_ms):
+        if index is self._pending_index:
+            self._swap_index(index, searchable, searcher, prepare_ms)
+            return
+        if index is not self.index_data:
+            # Another index was swapped in or queued meanwhile
+            if searcher is not None:
+                _close_in_background(searcher)
+            return
+        if searcher is not None:
+            # The shard processes hold the documents now; keeping only the
+            # vocabulary here frees the full index in this process
+            self.searcher = searcher
+            self.index_data = searchable
+        logger.info(f"Search prepared in {prepare_ms:.0f} ms off the GUI thread")
 
     def initUI(self):
         """Initialize the user interface."""
@@ -54,12 +124,12 @@ class MyWidget(QWidget):
         search_layout = QHBoxLayout()
         
         # Search input with improved styling
-        completer = CustomCompleter(self.autocomplete_words, self)
-        completer.setCaseSensitivity(Qt.CaseInsensitive)
-        completer.setCompletionMode(completer.PopupCompletion)
+        self.completer = CustomCompleter(self.autocomplete_words, self)
+        self.completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.completer.setCompletionMode(self.completer.PopupCompletion)
         
         self.search_input = QLineEdit()
-        self.search_input.setCompleter(completer)
+        self.search_input.setCompleter(self.completer)
         self.search_input.setPlaceholderText("Enter search keywords... (Press Tab to focus results)")
         self.search_input.setMinimumHeight(35)
         self.search_input.textChanged.connect(self._on_text_changed)
@@ -80,6 +150,13 @@ class MyWidget(QWidget):
         self.clear_button.clicked.connect(self.clear_search)
         search_layout.addWidget(self.clear_button)
 
+        # Re-index button: rebuilds in the background while searches continue
+        self.reindex_button = QPushButton("Re-index")
+        self.reindex_button.setMinimumHeight(35)
+        self.reindex_button.setMinimumWidth(80)
+        self.reindex_button.clicked.connect(self.reindex)
+        search_layout.addWidget(self.reindex_button)
+
         layout.addLayout(search_layout)
 
         # Results header
@@ -87,16 +164,28 @@ class MyWidget(QWidget):
         self.results_label = QLabel("Results: 0")
         results_header.addWidget(self.results_label)
         results_header.addStretch()
+
+        self.indexing_label = QLabel("")
+        self.indexing_label.setStyleSheet("color: #0066cc; font-size: 10pt;")
+        results_header.addWidget(self.indexing_label)
         
         help_label = QLabel("Double-click or press Enter to open file")
         help_label.setStyleSheet("color: gray; font-size: 10pt;")
         results_header.addWidget(help_label)
         layout.addLayout(results_header)
 
-        # Result list with improved styling
-        self.result_list = QListWidget()
+        # Result list: a virtualized view that fetches further pages on scroll
+        self.result_model = ResultModel(self)
+        self.result_model.fetch_failed.connect(self._fetch_failed)
+        self.result_model.rowsInserted.connect(
+            lambda *_: QTimer.singleShot(0, self._load_visible_snippets)
+        )
+        self.result_list = QListView()
+        self.result_list.setModel(self.result_model)
         self.result_list.setAlternatingRowColors(True)
-        self.result_list.itemDoubleClicked.connect(self.open_file)
+        self.result_list.doubleClicked.connect(self.open_file)
+        self.result_list.setItemDelegate(ResultDelegate(self.result_list))
+        self.result_list.verticalScrollBar().valueChanged.connect(self._load_visible_snippets)
         self.result_list.setMinimumHeight(400)
         layout.addWidget(self.result_list)
 
@@ -123,7 +212,10 @@ class MyWidget(QWidget):
 
     def _on_text_changed(self, text):
         """Handle text changes with debouncing for live search."""
-        pass
+        if text.strip():
+            self.search_timer.start(self.cfg["LIVE_SEARCH_DELAY_MS"])
+        else:
+            self.search_timer.stop()
 
     def _execute_search(self):
         """Execute the search operation."""
@@ -143,27 +235,33 @@ class MyWidget(QWidget):
             self.status_label.setStyleSheet("padding: 5px; background-color: #e6f3ff; border-radius: 3px; color: #0066cc;")
             self.search_button.setEnabled(False)
             
-            # Perform search
-            results = search(query, self.index_data)
-            
-            # Update results
-            self.result_list.clear()
+            # Perform search: only the first page now, the rest on scroll
+            fetch = self._page_fetcher(query)
+            results, cursor, total = fetch(None)
+            self._highlight_terms = set()
             
             if not results:
-                self.result_list.addItem("No results found. Try different keywords.")
+                self.result_model.reset(message="No results found. Try different keywords.")
                 self.results_label.setText("Results: 0")
-                self.status_label.setText(f"No results found for '{query}'")
+                self.status_label.setText(f"No results found for '{query}'{self._latency_text()}")
                 self.status_label.setStyleSheet("padding: 5px; background-color: #fff3cd; border-radius: 3px; color: #856404;")
             else:
-                for file in results:
-                    self.result_list.addItem(file)
-                
-                self.result_list.setCurrentRow(0)
-                self.results_label.setText(f"Results: {len(results)}")
-                self.status_label.setText(f"Found {len(results)} result(s) for '{query}'")
+                self._highlight_terms = query_terms(
+                    query,
+                    self.index_data,
+                    max_distance=self.cfg["FUZZY_MAX_DISTANCE"],
+                    penalty=self.cfg["FUZZY_PENALTY"],
+                )
+                self.result_model.reset(
+                    results, cursor, total, fetch=lambda cursor: fetch(cursor)[:2]
+                )
+                QTimer.singleShot(0, self._load_visible_snippets)
+                self.result_list.setCurrentIndex(self.result_model.index(0))
+                self.results_label.setText(f"Results: {total}")
+                self.status_label.setText(f"Found {total} result(s) for '{query}'{self._latency_text()}")
                 self.status_label.setStyleSheet("padding: 5px; background-color: #d4edda; border-radius: 3px; color: #155724;")
                 
-                logger.info(f"Search query '{query}' returned {len(results)} results")
+                logger.info(f"Search query '{query}' returned {total} results")
 
         except Exception as e:
             error_msg = f"Search error: {str(e)}"
@@ -175,24 +273,103 @@ class MyWidget(QWidget):
         finally:
             self.search_button.setEnabled(True)
 
+    def _fetch_failed(self, message):
+        self.status_label.setText(f"Search error while loading more results: {message}")
+        self.status_label.setStyleSheet("padding: 5px; background-color: #ffe6e6; border-radius: 3px; color: #cc0000;")
+
+    def _latency_text(self):
+        """Latency of the last query and recent percentiles, for the status label."""
+        stats = get_query_stats()
+        last = stats.last()
+        if last is None:
+            return ""
+        summary = stats.summary()
+        return (
+            f" in {last['total_ms']:.1f} ms"
+            f" (p50 {summary['p50_ms']:.0f} ms, p90 {summary['p90_ms']:.0f} ms"
+            f" over {summary['queries']} queries)"
+        )
+
+    def _page_fetcher(self, query):
+        """
+        Return ``fetch(cursor) -> (results, next cursor, total)`` for
+        ``query``. It is bound to the current index, so later pages stay
+        consistent with the first one.
+        """
+        searcher, index_data = self.searcher, self.index_data
+        options = dict(
+            limit=self.cfg["RESULTS_PAGE_SIZE"],
+            max_distance=self.cfg["FUZZY_MAX_DISTANCE"],
+            penalty=self.cfg["FUZZY_PENALTY"],
+        )
+
+        def fetch(cursor):
+            if searcher is not None:
+                return searcher.search_page(query, cursor=cursor, **options)
+            return search_page(query, index_data, cursor=cursor, **options)
+
+        return fetch
+
+    def _load_visible_snippets(self):
+        """Fill in highlighted snippets for the result rows currently on screen."""
+        if not self._highlight_terms:
+            return
+
+        viewport = self.result_list.viewport()
+        row = self.result_list.indexAt(viewport.rect().topLeft()).row()
+        if row < 0:
+            return
+
+        while row < self.result_model.rowCount():
+            index = self.result_model.index(row)
+            if self.result_list.visualRect(index).top() > viewport.height():
+                break
+            if index.data(SNIPPET_ROLE) is None:
+                self.result_model.setData(index, self._make_snippet(index), SNIPPET_ROLE)
+            row += 1
+
+    def _make_snippet(self, index):
+        """Snippet HTML for a result row, taken from its best page if known."""
+        text = self.text_store.get(index.data(Qt.DisplayRole))
+        if not text:
+            return ""
+        pages = index.data(PAGES_ROLE) or []
+        if pages:
+            text = get_page(text, pages[0])
+        snippet = make_snippet(text, self._highlight_terms, max_chars=self.cfg["SNIPPET_CHARS"])
+        if pages:
+            page_list = ", ".join(str(p) for p in pages)
+            snippet = f"<i>p. {page_list}</i> — {snippet}"
+        copies = len(index.data(DUPLICATES_ROLE) or [])
+        if copies:
+            snippet += f" <i>(+{copies} identical {'copy' if copies == 1 else 'copies'})</i>"
+        return snippet
+
     def clear_search(self):
         """Clear search input and results."""
         self.search_input.clear()
-        self.result_list.clear()
+        self.result_model.reset()
+        self._highlight_terms = set()
         self.results_label.setText("Results: 0")
         self.status_label.setText("Ready")
         self.status_label.setStyleSheet("padding: 5px; background-color: #f0f0f0; border-radius: 3px;")
         self.search_input.setFocus()
 
-    def open_file(self, item):
-        """Open the selected file."""
-        file_path = item.text()
-        
-        if file_path in ("No results found. Try different keywords.", "No results found"):
+    def open_file(self, index):
+        """Open the file of the selected result row."""
+        if self.result_model.result(index.row()) is None:
             return
+        file_path = index.data(Qt.DisplayRole)
 
         file = Path(file_path)
         
+        if not file.exists():
+            # Fall back to an identical copy if this one was moved or deleted
+            for copy in index.data(DUPLICATES_ROLE) or []:
+                if Path(copy).exists():
+                    file_path, file = copy, Path(copy)
+                    break
+
         if not file.exists():
             QMessageBox.warning(
                 self, 
@@ -202,8 +379,16 @@ class MyWidget(QWidget):
             logger.warning(f"Attempted to open non-existent file: {file_path}")
             return
 
+        pages = index.data(PAGES_ROLE) or []
+        open_command = self.cfg["PDF_OPEN_COMMAND"]
+
         try:
-            if sys.platform == "win32":
+            if pages and open_command and file.suffix.lower() == ".pdf":
+                # e.g. ["evince", "--page-label={page}", "{path}"]
+                subprocess.Popen(
+                    [part.format(path=file_path, page=pages[0]) for part in open_command]
+                )
+            elif sys.platform == "win32":
                 subprocess.Popen(['start', '', file_path], shell=True)
             elif sys.platform == "darwin":  # macOS
                 subprocess.Popen(['open', file_path])
@@ -233,38 +418,125 @@ class MyWidget(QWidget):
             if self.search_input.hasFocus():
                 self.perform_search()
             elif self.result_list.hasFocus():
-                items = self.result_list.selectedItems()
-                if items:
-                    self.open_file(items[0])
+                index = self.result_list.currentIndex()
+                if index.isValid():
+                    self.open_file(index)
         
         elif key == Qt.Key_Tab:
             event.accept()
             if self.search_input.hasFocus():
-                if self.result_list.count() > 0:
+                if self.result_model.rowCount() > 0:
                     self.result_list.setFocus()
-                    self.result_list.setCurrentRow(0)
+                    self.result_list.setCurrentIndex(self.result_model.index(0))
             else:
                 self.search_input.setFocus()
         
         elif key == Qt.Key_Down and self.search_input.hasFocus():
-            if self.result_list.count() > 0:
+            if self.result_model.rowCount() > 0:
                 self.result_list.setFocus()
-                self.result_list.setCurrentRow(0)
+                self.result_list.setCurrentIndex(self.result_model.index(0))
         
         else:
             super().keyPressEvent(event)
 
+    def closeEvent(self, event):
+        if self.indexing_thread is not None and self.indexing_thread.isRunning():
+            # Finished work is checkpointed, so the next run resumes from it
+            self.indexing_thread.cancel()
+            self.indexing_thread.wait()
+        for thread in list(self._search_preps):
+            thread.ready.disconnect()
+            thread.wait()
+            if thread.searcher is not None:
+                thread.searcher.close()
+        if self.searcher is not None:
+            self.searcher.close()
+            self.searcher = None
+        try:
+            get_query_stats().save(self.cfg["QUERY_STATS_FILE"])
+        except OSError as e:
+            logger.error(f"Error saving query stats: {e}")
+        super().closeEvent(event)
+
+    def reindex(self):
+        """Rebuild the index in the background; searches keep using the current one."""
+        if self.indexing_thread is not None and self.indexing_thread.isRunning():
+            return
+        self.indexing_thread = IndexingThread(self)
+        self.indexing_thread.progress.connect(self.indexing_label.setText)
+        self.indexing_thread.finished_signal.connect(self.update_index)
+        self.indexing_thread.finished.connect(lambda: self.reindex_button.setEnabled(True))
+        self.reindex_button.setEnabled(False)
+        self.indexing_thread.start()
+        logger.info("Background re-indexing started")
+
+    def offer_reindex(self, reason):
+        """Ask whether to rebuild an index that no longer matches the settings."""
+        answer = QMessageBox.question(
+            self,
+            "Index out of date",
+            f"{reason}\n\nSome searches may find nothing until the index is rebuilt. "
+            "Re-index now? You can keep searching the current index meanwhile.",
+        )
+        if answer == QMessageBox.Yes:
+            self.reindex()
+
     def update_index(self, new_index_data, new_autocomplete_words):
-        """Update index data and autocomplete words."""
-        self.index_data = new_index_data
-        self.autocomplete_words = new_autocomplete_words
-        
-        # Update completer with new words
-        completer = CustomCompleter(new_autocomplete_words, self)
-        completer.setCaseSensitivity(Qt.CaseInsensitive)
-        completer.setCompletionMode(completer.PopupCompletion)
-        self.search_input.setCompleter(completer)
-        
-        self.status_label.setText("Index updated successfully")
+        """
+        Get a re-built index ready for searching, then swap it in.
+
+        Its fuzzy matcher and, with SEARCH_SHARDS > 1, its shard processes
+        are built in a SearchPreparationThread while the current index and
+        searcher keep answering queries. ``_swap_index`` then swaps it in.
+        """
+        if not isinstance(new_index_data, CompactIndex):
+            new_index_data = CompactIndex.from_dict(new_index_data)
+        # A newer index replaces one that is still being prepared
+        self._pending_index = new_index_data
+        self._pending_words = new_autocomplete_words
+        self.indexing_label.setText("Preparing the new index for searching...")
+        self._prepare_search(new_index_data)
+
+    def _swap_index(self, index, searchable, searcher, prepare_ms):
+        """
+        Swap a prepared index in without rebuilding any widget.
+
+        Only the index, text store and searcher are rebound and the
+        completer's word list refreshed. This runs on the GUI thread between
+        two searches, so a query sees either the old index or the new one,
+        never a mix. The old shard processes are stopped in the background.
+        """
+        words = self._pending_words
+        self._pending_index = self._pending_words = None
+        started = time.perf_counter()
+        old_searcher = self.searcher
+        self.index_data = searchable
+        self.autocomplete_words = words
+        self.text_store = self._open_text_store(index)
+        self.searcher = searcher
+        self.completer.set_words(words)
+        swap_ms = (time.perf_counter() - started) * 1000
+
+        logger.info(f"New index prepared in {prepare_ms:.0f} ms off the GUI thread")
+        if swap_ms > FRAME_MS:
+            logger.warning(f"Index swap took {swap_ms:.1f} ms, more than a frame ({FRAME_MS:.1f} ms)")
+        else:
+            logger.info(f"Index swapped in {swap_ms:.2f} ms")
+
+        if old_searcher is not None:
+            _close_in_background(old_searcher)
+        # The shown rows page through the old index and searcher; drop them
+        self.result_model.reset()
+        self._highlight_terms = set()
+        self.results_label.setText("Results: 0")
+        if self.search_input.text().strip():
+            # Show the current query's results from the new index
+            QTimer.singleShot(0, self.perform_search)
+
+        self.indexing_label.setText("")
+        self.status_label.setText(
+            f"Index updated: {len(index)} document(s), prepared in {prepare_ms:.0f} ms "
+            f"in the background, swapped in {swap_ms:.1f} ms"
+        )
         self.status_label.setStyleSheet("padding: 5px; background-color: #d4edda; border-radius: 3px; color: #155724;")
         logger.info("Index and autocomplete data updated")
\ No newline at end of file
@@ -1,14 +1,22 @@
-import json
 import os
 import subprocess
+import time
 from pathlib import Path
 
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from core.checkpoint import has_checkpoint
+from core.compact_index import CompactIndex
 from core.config import load_config
-from core.index_manager import generate_autocomplete, save_index
+from core.external_index import ExternalIndexBuilder
+from core.fuzzy import get_matcher
+from core.index_manager import atomic_write_json, generate_autocomplete, save_index_records
+from core.keyword_extraction import warm_up
 from core.logger import setup_logger
-from core.processor import process_all_batches
+from core.ocr import ocr_settings
+from core.processor import IndexingCancelled, process_all_batches
+from core.search_engine import FUZZY_MIN_LENGTH
+from core.sharding import ShardedSearcher
 
 logger = setup_logger(__name__)
 
@@ -17,7 +25,7 @@ class IndexingThread(QThread):
     """Background thread for indexing operations."""
     
     progress = pyqtSignal(str)
-    finished_signal = pyqtSignal(dict, list)
+    finished_signal = pyqtSignal(object, list)
     error_signal = pyqtSignal(str)
 
     def __init__(self, parent=None):
@@ -37,9 +45,13 @@ class IndexingThread(QThread):
                 return
 
             self._emit_progress("Starting indexing process...")
+            checkpoint_dir = self.cfg["CHECKPOINT_DIR"]
             
-            # Step 1: Run batch script
-            if not self._run_batch_script():
+            # Step 1: Run batch script, unless an interrupted run can be resumed
+            # with the file lists it already collected
+            if has_checkpoint(checkpoint_dir) and self._collect_batch_files():
+                self._emit_progress("Resuming interrupted indexing run...")
+            elif not self._run_batch_script():
                 return
 
             if self._is_cancelled:
@@ -58,20 +70,58 @@ class IndexingThread(QThread):
 
             # Step 3: Process files
             self._emit_progress(f"Processing {len(batch_files)} batch(es) in parallel...")
-            D = process_all_batches(batch_files, self.cfg["TOP_KEYWORDS"])
+            text_store_dir = self.cfg["TEXT_STORE_DIR"] if self.cfg["STORE_TEXT"] else None
+            builder = None
+            if self.cfg["INDEX_MEMORY_MB"]:
+                builder = ExternalIndexBuilder(self.cfg["SPILL_DIR"], self.cfg["INDEX_MEMORY_MB"])
+            # The spill directory is removed however this ends; a resumed run
+            # refills a new builder from the checkpoint
+            try:
+                forms = {}
+                D, pages, duplicates = process_all_batches(
+                    batch_files,
+                    self.cfg["TOP_KEYWORDS"],
+                    text_store_dir,
+                    page_level=self.cfg["PAGE_LEVEL_INDEX"],
+                    ocr=ocr_settings(self.cfg),
+                    dedup=self.cfg["DEDUPLICATE"],
+                    checkpoint_dir=checkpoint_dir,
+                    chunk_size=self.cfg["CHECKPOINT_INTERVAL"],
+                    should_cancel=lambda: self._is_cancelled,
+                    progress=self._on_units_done,
+                    builder=builder,
+                    forms=forms,
+                    page_top_n=self.cfg["PAGE_TOP_KEYWORDS"],
+                    formats=self.cfg["SUPPORTED_FORMATS"],
+                )
 
-            if self._is_cancelled:
-                self._emit_progress("Indexing cancelled")
-                return
+                if self._is_cancelled:
+                    self._emit_progress("Indexing cancelled")
+                    return
 
-            if not D:
-                self._emit_error("No data indexed. Check if PDF files exist in specified directories.")
-                return
+                # Build the in-memory index here rather than on the GUI thread
+                if builder is not None:
+                    self._emit_progress("Merging spilled index runs...")
+                    index, duplicates = builder.finish(duplicates)
+                    records = builder.documents()
+                else:
+                    index = CompactIndex.from_dict(D, pages, duplicates)
+                    records = ((path, kws, pages.get(path)) for path, kws in D.items())
 
-            # Step 4: Save index
-            self._emit_progress("Saving index to disk...")
-            save_index(D, self.cfg["OUTPUT_FILE"])
-            self._emit_progress(f"Index saved with {len(D)} entries")
+                if not index:
+                    self._emit_error("No data indexed. Check if PDF files exist in specified directories.")
+                    return
+
+                # Step 4: Publish the index and its text store as a new generation;
+                # a running search window keeps using the previous one until then
+                self._emit_progress("Saving index to disk...")
+                manifest = save_index_records(
+                    records, self.cfg["OUTPUT_FILE"], duplicates, text_store_dir, checkpoint_dir
+                )
+            finally:
+                if builder is not None:
+                    builder.clear()
+            self._emit_progress(f"Index saved with {len(index)} entries")
 
             if self._is_cancelled:
                 self._emit_progress("Indexing cancelled")
@@ -79,20 +129,26 @@ class IndexingThread(QThread):
 
             # Step 5: Generate autocomplete
             self._emit_progress("Generating autocomplete data...")
-            words = generate_autocomplete(D, self.cfg["AUTOCOMPLETE_WORDS"])
+            words = generate_autocomplete(index, self.cfg["AUTOCOMPLETE_WORDS"], forms)
             
             autocomplete_path = Path(self.cfg["AUTOCOMPLETE_FILE"])
             autocomplete_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(autocomplete_path, "w", encoding="utf-8") as f:
-                json.dump(words, f, indent=2)
+            atomic_write_json(autocomplete_path, words, indent=2)
             
             self._emit_progress(f"Autocomplete saved with {len(words)} words")
 
+            index.generation = manifest["generation"]
+            if manifest["text_store"]:
+                index.text_store_dir = str(Path(self.cfg["OUTPUT_FILE"]).with_name(manifest["text_store"]))
+
             # Finish
             self._emit_progress("✓ Indexing completed successfully!")
-            self.finished_signal.emit(D, words)
-            logger.info(f"Indexing completed: {len(D)} files indexed, {len(words)} autocomplete words")
+            self.finished_signal.emit(index, words)
+            logger.info(f"Indexing completed: {len(index)} files indexed, {len(words)} autocomplete words")
+
+        except IndexingCancelled:
+            logger.info("Indexing cancelled; finished work is kept in the checkpoint")
+            self.progress.emit("Indexing cancelled (progress saved, it will resume next time)")
 
         except Exception as e:
             error_msg = f"Indexing error: {str(e)}"
@@ -100,8 +156,9 @@ class IndexingThread(QThread):
             self._emit_error(error_msg)
 
     def _run_batch_script(self):
-        """Run the appropriate batch script for the OS."""
+        """Run the appropriate batch script for the OS, scanning for SUPPORTED_FORMATS."""
         self._emit_progress("Running batch script to collect file paths...")
+        formats = list(self.cfg["SUPPORTED_FORMATS"])
         
         try:
             if os.name == "nt":  # Windows
@@ -111,7 +168,7 @@ class IndexingThread(QThread):
                     return False
                 
                 result = subprocess.run(
-                    [str(script_path)],
+                    [str(script_path), *formats],
                     shell=True,
                     capture_output=True,
                     text=True,
@@ -124,7 +181,7 @@ class IndexingThread(QThread):
                     return False
                 
                 result = subprocess.run(
-                    ["bash", str(script_path)],
+                    ["bash", str(script_path), *formats],
                     capture_output=True,
                     text=True,
                     timeout=300
@@ -172,6 +229,10 @@ class IndexingThread(QThread):
 
         return batch_files
 
+    def _on_units_done(self, done, total):
+        """Progress callback from process_all_batches."""
+        self._emit_progress(f"Indexed {done}/{total} chunk(s)...")
+
     def _emit_progress(self, message):
         """Emit progress message if not cancelled."""
         if not self._is_cancelled:
@@ -181,4 +242,44 @@ class IndexingThread(QThread):
         """Emit error message."""
         logger.error(message)
         self.error_signal.emit(message)
-        self.progress.emit(f"✗ ERROR: {message}")
\ No newline at end of file
+        self.progress.emit(f"✗ ERROR: {message}")
+
+
+class SearchPreparationThread(QThread):
+    """
+    Get an index ready for searching without blocking the GUI: load RAKE,
+    partition the index and start the shard processes (SEARCH_SHARDS > 1),
+    and build the fuzzy matcher for the vocabulary queries are expanded
+    against.
+
+    ``ready`` is emitted with ``(index, searchable, searcher or None,
+    milliseconds taken)``. ``searchable`` is what the window should search
+    and expand queries against: the index itself, or only its vocabulary
+    once shard processes hold the documents.
+    """
+
+    ready = pyqtSignal(object, object, object, float)
+
+    def __init__(self, index, cfg, reload=None, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.cfg = cfg
+        self.reload = reload
+        self.searcher = None
+
+    def run(self):
+        started = time.perf_counter()
+        index, self.index = self.index, None
+        warm_up()
+        searchable = index
+        if self.cfg["SEARCH_SHARDS"] > 1 and index:
+            try:
+                self.searcher = ShardedSearcher(
+                    index, self.cfg["SEARCH_SHARDS"], self.reload, self.cfg["SEARCH_SHARD_TIMEOUT"]
+                )
+                searchable = self.searcher.vocabulary
+            except Exception as e:
+                logger.error(f"Could not start search shards, searching in-process: {e}")
+        if self.cfg["FUZZY_MAX_DISTANCE"] > 0:
+            get_matcher(searchable, self.cfg["FUZZY_MAX_DISTANCE"], FUZZY_MIN_LENGTH)
+        self.ready.emit(index, searchable, self.searcher, (time.perf_counter() - started) * 1000)
@@ -1,5 +1,18 @@
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QCompleter
+import html
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QSize, QStringListModel, Qt, pyqtSignal
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtWidgets import (
+    QApplication, QCompleter, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+)
+
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SNIPPET_ROLE = Qt.UserRole + 1
+PAGES_ROLE = Qt.UserRole + 2
+DUPLICATES_ROLE = Qt.UserRole + 3
 
 
 class CustomCompleter(QCompleter):
@@ -20,6 +33,15 @@ class CustomCompleter(QCompleter):
         self.setCompletionMode(QCompleter.PopupCompletion)
         self.setMaxVisibleItems(10)
 
+    def set_words(self, words):
+        """Replace the vocabulary in place, keeping the completer and its popup."""
+        self.words = sorted(set(words))
+        model = self.model()
+        if isinstance(model, QStringListModel):
+            model.setStringList(self.words)
+        else:
+            self.setModel(QStringListModel(self.words, self))
+
     def splitPath(self, path):
         """
         Split the input path to get the current word being typed.
@@ -91,7 +113,6 @@ class CustomCompleter(QCompleter):
         matches = [word for word in self.words if word.lower().startswith(current_word)]
         
         # Update the model with filtered matches
-        from PyQt5.QtCore import QStringListModel
         self.setModel(QStringListModel(matches))
 
     def insertText(self, completion):
@@ -168,7 +189,6 @@ class SearchHistoryCompleter(QCompleter):
             # Keep only last 100 queries
             self.history = self.history[:100]
             
-            from PyQt5.QtCore import QStringListModel
             self.setModel(QStringListModel(self.history))
 
     def get_history(self):
@@ -178,4 +198,151 @@ class SearchHistoryCompleter(QCompleter):
         Returns:
             List of search queries in chronological order (most recent first)
         """
-        return self.history.copy()
\ No newline at end of file
+        return self.history.copy()
+
+
+class ResultModel(QAbstractListModel):
+    """
+    Virtualized list model over paginated search results.
+
+    Only the result pages fetched so far are held. When the view scrolls to
+    the end, it asks for more through ``canFetchMore``/``fetchMore``, and
+    the model calls ``fetch(cursor)`` for the next page. Without results,
+    the model shows a single message row instead. If a fetch fails, no more
+    pages are fetched and ``fetch_failed`` is emitted with the error.
+    """
+
+    fetch_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._results = []
+        self._snippets = {}
+        self._fetch = None
+        self._cursor = None
+        self._message = None
+        self.total = 0
+
+    def reset(self, results=(), cursor=None, total=0, fetch=None, message=None):
+        """
+        Show a first page of results. ``fetch(cursor)`` must return
+        ``(results, next cursor)``.
+        """
+        self.beginResetModel()
+        self._results = list(results)
+        self._snippets = {}
+        self._cursor = cursor
+        self._fetch = fetch
+        self._message = message
+        self.total = total
+        self.endResetModel()
+
+    def result(self, row):
+        """The SearchResult shown in ``row``, or None for the message row."""
+        if 0 <= row < len(self._results):
+            return self._results[row]
+        return None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if not self._results and self._message:
+            return 1
+        return len(self._results)
+
+    def data(self, index, role=Qt.DisplayRole):
+        result = self.result(index.row())
+        if result is None:
+            if role == Qt.DisplayRole and index.row() == 0:
+                return self._message
+            return None
+        if role == Qt.DisplayRole:
+            return result.path
+        if role == PAGES_ROLE:
+            return result.pages
+        if role == DUPLICATES_ROLE:
+            return result.duplicates or None
+        if role == SNIPPET_ROLE:
+            return self._snippets.get(index.row())
+        if role == Qt.ToolTipRole and result.duplicates:
+            return "Identical copies:\n" + "\n".join(result.duplicates)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != SNIPPET_ROLE or self.result(index.row()) is None:
+            return False
+        self._snippets[index.row()] = value
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetch is not None and self._cursor is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        try:
+            results, self._cursor = self._fetch(self._cursor)
+        except Exception as e:
+            # Called by Qt: an exception escaping here would abort the app
+            logger.error(f"Error fetching more results: {e}", exc_info=True)
+            self._cursor = None
+            self.fetch_failed.emit(str(e))
+            return
+        if not results:
+            return
+        start = len(self._results)
+        self.beginInsertRows(QModelIndex(), start, start + len(results) - 1)
+        self._results.extend(results)
+        self.endInsertRows()
+
+
+class ResultDelegate(QStyledItemDelegate):
+    """
+    Item delegate that renders a result path with its highlighted snippet.
+    
+    Items without a snippet (``SNIPPET_ROLE`` unset) are drawn normally, so
+    snippets can be filled in lazily as rows scroll into view.
+    """
+
+    def _document(self, option, index):
+        snippet = index.data(SNIPPET_ROLE)
+        if not snippet:
+            return None
+        doc = QTextDocument()
+        doc.setDefaultFont(option.font)
+        doc.setHtml(
+            f"{html.escape(index.data(Qt.DisplayRole) or '')}<br>"
+            f"<span style='color: gray;'>{snippet}</span>"
+        )
+        width = option.rect.width()
+        if width <= 0 and option.widget is not None:
+            width = option.widget.viewport().width()
+        doc.setTextWidth(width)
+        return doc
+
+    def paint(self, painter, option, index):
+        """Draw the item background and selection, then the rich text on top."""
+        doc = self._document(option, index)
+        if doc is None:
+            super().paint(painter, option, index)
+            return
+
+        options = QStyleOptionViewItem(option)
+        self.initStyleOption(options, index)
+        options.text = ""
+        style = options.widget.style() if options.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, options, painter, options.widget)
+
+        painter.save()
+        painter.translate(options.rect.topLeft())
+        painter.setClipRect(options.rect.translated(-options.rect.topLeft()))
+        doc.drawContents(painter)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        """Grow rows that carry a snippet to fit the wrapped text."""
+        doc = self._document(option, index)
+        if doc is None:
+            return super().sizeHint(option, index)
+        return QSize(int(doc.idealWidth()), int(doc.size().height()))
\ No newline at end of file
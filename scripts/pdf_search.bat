@@ -1,9 +1,16 @@
 @echo off
 REM ==================================================
 REM pdf_search.bat - File Path Collection Script
-REM Scans system for PDF and DOCX files
+REM Scans system for supported document files
+REM Usage: pdf_search.bat [.ext ...]   (default: all supported formats)
 REM ==================================================
 
+REM Extensions to collect; the app passes its SUPPORTED_FORMATS
+set "EXTENSIONS=%*"
+if "%EXTENSIONS%"=="" set "EXTENSIONS=.pdf .docx .txt .md .html .htm .pptx .xlsx .odt .epub"
+set "PATTERNS="
+for %%e in (%EXTENSIONS%) do call set "PATTERNS=%%PATTERNS%% C:\*%%e"
+
 echo Starting file scan...
 echo This may take a few minutes...
 
@@ -13,9 +20,12 @@ if not exist "all" mkdir all
 REM Clear old files
 del /Q all\*.txt 2>NUL
 
-REM Scan C: drive for PDF and DOCX files
+REM Scan C: drive for supported document files
 echo Scanning C: drive...
-dir /s /b C:\*.pdf C:\*.docx > all\all_files.txt 2>NUL
+dir /s /b %PATTERNS% > all\scan.tmp 2>NUL
+REM Drop our own file list, which matches *.txt
+findstr /v /i /c:"all_files.txt" /c:"scan.tmp" all\scan.tmp > all\all_files.txt
+del /Q all\scan.tmp 2>NUL
 
 REM Count total files
 for /f %%a in ('type all\all_files.txt ^| find /c /v ""') do set total=%%a
@@ -1,8 +1,22 @@
 # ==================================================
 # pdf_search.sh - File Path Collection Script
-# Scans system for PDF and DOCX files (Linux/Mac)
+# Scans system for supported document files (Linux/Mac)
+# Usage: pdf_search.sh [.ext ...]   (default: all supported formats)
 # ==================================================
 
+# Extensions to collect; the app passes its SUPPORTED_FORMATS
+if [ "$#" -gt 0 ]; then
+    extensions=("$@")
+else
+    extensions=(.pdf .docx .txt .md .html .htm .pptx .xlsx .odt .epub)
+fi
+
+name_tests=()
+for ext in "${extensions[@]}"; do
+    [ "${#name_tests[@]}" -gt 0 ] && name_tests+=(-o)
+    name_tests+=(-iname "*.${ext#.}")
+done
+
 echo "Starting file scan..."
 echo "This may take a few minutes..."
 
@@ -12,10 +26,10 @@ mkdir -p all
 # Clear old batch files
 rm -f all/pdf_part_*.txt
 
-# Scan root directory (or home) for PDF and DOCX files
+# Scan root directory (or home) for document files, skipping our own output folder
 # Change "/" to specific directory if scanning entire system is too slow
-echo "Scanning / for PDF and DOCX files..."
-find / -type f \( -iname "*.pdf" -o -iname "*.docx" \) 2>/dev/null > all/all_files.txt
+echo "Scanning / for document files..."
+find / -path "$(pwd)/all" -prune -o -type f \( "${name_tests[@]}" \) -print 2>/dev/null > all/all_files.txt
 
 # Count total files
 total=$(wc -l < all/all_files.txt)
@@ -1,32 +1,83 @@
 import json
-import os
 import sys
 from datetime import datetime
 
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget
 
 from core.config import load_config
-from core.index_manager import generate_autocomplete, load_index, save_index
+from core.index_manager import index_exists, load_compact_index, normalizer_mismatch
 from core.logger import setup_logger
+from core.query_stats import QueryStats, format_summary, get_query_stats
 from gui.main_window import MyWidget
 from gui.threads import IndexingThread
 
 logger = setup_logger("main")
 
+
+def show_stats(cfg, queries):
+    """
+    ``searchEngine.py stats [QUERY ...]``: print query latency statistics.
+
+    With queries, they are run against the saved index and their timings
+    reported. Without, the traces saved by the last GUI session are shown.
+    """
+    if queries:
+        from core.search_engine import search_results
+
+        index = load_compact_index(cfg["OUTPUT_FILE"])
+        for query in queries:
+            if not query.strip():
+                print(f"{query!r}: skipped, blank query")
+                continue
+            results = search_results(
+                query,
+                index,
+                max_distance=cfg["FUZZY_MAX_DISTANCE"],
+                penalty=cfg["FUZZY_PENALTY"],
+                top_k=cfg["RESULTS_PAGE_SIZE"],
+            )
+            trace = get_query_stats().last()
+            print(
+                f"{query!r}: {len(results)} result(s), {trace['candidates']} candidates, "
+                f"parse {trace['parse_ms']:.1f} ms, scoring {trace['scoring_ms']:.1f} ms, "
+                f"total {trace['total_ms']:.1f} ms"
+            )
+        stats = get_query_stats()
+    else:
+        try:
+            stats = QueryStats.load(cfg["QUERY_STATS_FILE"])
+        except FileNotFoundError:
+            print(f"No query stats saved yet ({cfg['QUERY_STATS_FILE']})")
+            return
+    print(format_summary(stats))
+
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["stats"]:
+        show_stats(load_config(), sys.argv[2:])
+        sys.exit(0)
+
     app = QApplication(sys.argv)
     cfg = load_config()
 
     start = datetime.now()
     logger.info("Starting Lexical Search Engine")
 
-    if os.path.exists(cfg["OUTPUT_FILE"]):
-        D = load_index(cfg["OUTPUT_FILE"])
+    if index_exists(cfg["OUTPUT_FILE"]):
+        index = load_compact_index(cfg["OUTPUT_FILE"])
         with open(cfg["AUTOCOMPLETE_FILE"], "r") as f:
             autocomplete_words = json.load(f)
 
-        widget = MyWidget(autocomplete_words, D)
+        widget = MyWidget(autocomplete_words, index)
+        del index  # the window may replace it with the vocabulary when sharded
         widget.show()
+        logger.info(f"Search window ready in {(datetime.now() - start).total_seconds():.2f}s")
+
+        stale = normalizer_mismatch(cfg["OUTPUT_FILE"], cfg)
+        if stale:
+            logger.warning(stale)
+            QTimer.singleShot(0, lambda: widget.offer_reindex(stale))
 
     else:
         loading = QWidget()
@@ -40,10 +91,11 @@ if __name__ == "__main__":
         thread = IndexingThread()
         thread.progress.connect(label.setText)
 
-        def complete(D, words):
-            save_index(D, cfg["OUTPUT_FILE"])
+        def complete(index, words):
+            # Keep a module-level reference, or the window is garbage-collected
+            global widget
             loading.close()
-            widget = MyWidget(words, D)
+            widget = MyWidget(words, index)
             widget.show()
 
         thread.finished_signal.connect(complete)
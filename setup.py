@@ -12,13 +12,13 @@ def print_header(text):
 
 
 def check_python_version():
-    """Ensure Python 3.8+"""
+    """Ensure Python 3.9+"""
     print_header("Checking Python Version")
     version = sys.version_info
     print(f"Python version: {version.major}.{version.minor}.{version.micro}")
 
-    if version.major < 3 or (version.major == 3 and version.minor < 8):
-        print("❌ Error: Python 3.8 or higher required!")
+    if version.major < 3 or (version.major == 3 and version.minor < 9):
+        print("❌ Error: Python 3.9 or higher required!")
         return False
 
     print("SUCCESSFUL: Python version OK")
@@ -0,0 +1,83 @@
+import json
+
+from core.checkpoint import JOURNAL_FILE, Checkpoint, has_checkpoint
+
+
+def _record_run(checkpoint_dir):
+    checkpoint = Checkpoint(checkpoint_dir, "run-1")
+    checkpoint.start({"/docs/a.pdf": ["/docs/a_copy.pdf"]})
+    checkpoint.record_unit(
+        "part_1-00000",
+        {"/docs/a.pdf": ["neural", "network"], "/docs/b.txt": ["databas"]},
+        {"/docs/a.pdf": {"neural": [1, 3], "network": [3]}},
+        [["/docs/scan.pdf", [0, 1]]],
+        {"network": "networks"},
+    )
+    checkpoint.record_unit("part_1-00001", {"/docs/c.md": ["index"]}, {}, [], {})
+    checkpoint.record_ocr("/docs/scan.pdf", ["invoic"], None, {"invoic": "invoice"})
+    checkpoint.close()
+
+
+def test_resume_replays_journal(tmp_path):
+    _record_run(tmp_path)
+    assert has_checkpoint(tmp_path)
+
+    checkpoint = Checkpoint(tmp_path, "run-1")
+    assert checkpoint.resume()
+    assert checkpoint.done_units == {"part_1-00000", "part_1-00001"}
+    assert checkpoint.documents == {
+        "/docs/a.pdf": ["neural", "network"],
+        "/docs/b.txt": ["databas"],
+        "/docs/c.md": ["index"],
+        "/docs/scan.pdf": ["invoic"],
+    }
+    assert checkpoint.pages == {"/docs/a.pdf": {"neural": [1, 3], "network": [3]}}
+    assert checkpoint.document_count == 4
+    assert checkpoint.ocr_jobs == {}  # finished by the OCR entry
+    assert checkpoint.duplicates == {"/docs/a.pdf": ["/docs/a_copy.pdf"]}
+    assert checkpoint.forms == {"network": {"networks": 1}, "invoic": {"invoice": 1}}
+
+
+def test_resume_streams_documents_to_callback(tmp_path):
+    _record_run(tmp_path)
+    seen = []
+    checkpoint = Checkpoint(tmp_path, "run-1", on_document=lambda *doc: seen.append(doc))
+    assert checkpoint.resume()
+    assert [path for path, _, _ in seen] == [
+        "/docs/a.pdf",
+        "/docs/b.txt",
+        "/docs/c.md",
+        "/docs/scan.pdf",
+    ]
+    assert checkpoint.documents == {}
+    assert checkpoint.document_count == 4
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    _record_run(tmp_path)
+    journal = tmp_path / JOURNAL_FILE
+    intact = journal.read_bytes()
+    torn = json.dumps({"unit": "part_2-00000", "documents": {"/docs/d.pdf": ["x"]}})
+    with open(journal, "ab") as f:
+        f.write(torn[: len(torn) // 2].encode("utf-8"))
+
+    checkpoint = Checkpoint(tmp_path, "run-1")
+    assert checkpoint.resume()
+    assert "part_2-00000" not in checkpoint.done_units
+    assert "/docs/d.pdf" not in checkpoint.documents
+    assert journal.read_bytes() == intact
+
+    # The redone unit is appended on a clean line and replays next time
+    checkpoint.record_unit("part_2-00000", {"/docs/d.pdf": ["retri"]}, {}, [])
+    checkpoint.close()
+    checkpoint = Checkpoint(tmp_path, "run-1")
+    assert checkpoint.resume()
+    assert checkpoint.documents["/docs/d.pdf"] == ["retri"]
+    assert len(checkpoint.done_units) == 3
+
+
+def test_other_run_does_not_resume(tmp_path):
+    _record_run(tmp_path)
+    checkpoint = Checkpoint(tmp_path, "run-2")
+    assert not checkpoint.resume()
+    assert checkpoint.documents == {}
@@ -0,0 +1,34 @@
+from core import dedup
+from core.dedup import PARTIAL_HASH_BYTES, find_duplicates
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_find_duplicates(tmp_path, monkeypatch):
+    edge = b"e" * PARTIAL_HASH_BYTES
+    middle = _write(tmp_path / "middle.bin", edge + b"A" * 100 + edge)
+    other_middle = _write(tmp_path / "other_middle.bin", edge + b"B" * 100 + edge)
+    first = _write(tmp_path / "z_first.txt", b"same content")
+    copy = _write(tmp_path / "a_copy.txt", b"same content")
+    second_copy = _write(tmp_path / "sub_copy.txt", b"same content")
+    same_size = _write(tmp_path / "same_size.txt", b"diff content")
+    unique = _write(tmp_path / "unique.txt", b"a file of its own size")
+
+    hashed = []
+    file_hash = dedup.file_hash
+    monkeypatch.setattr(dedup, "file_hash", lambda p: hashed.append(p) or file_hash(p))
+
+    paths = [first, middle, copy, same_size, other_middle, unique, second_copy, "/missing"]
+    assert find_duplicates(paths) == {first: [copy, second_copy]}
+    # Only files surviving the size and partial-hash checks are read in full
+    assert sorted(hashed) == sorted([middle, other_middle, first, copy, second_copy])
+
+
+def test_first_path_is_canonical(tmp_path):
+    a = _write(tmp_path / "a.txt", b"copy")
+    b = _write(tmp_path / "b.txt", b"copy")
+    assert find_duplicates([b, a]) == {b: [a]}
+    assert find_duplicates([a]) == {}
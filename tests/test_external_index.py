@@ -0,0 +1,83 @@
+import random
+
+from core.compact_index import CompactIndex
+from core.external_index import ExternalIndexBuilder
+from core.index_manager import load_compact_index, save_index, save_index_records
+
+VOCABULARY = [f"term{chr(97 + i % 26)}{i}" for i in range(300)]
+
+
+def _corpus(n=200, seed=7):
+    rng = random.Random(seed)
+    documents, pages = {}, {}
+    for i in range(n):
+        path = f"/docs/{i % 7}/file{i}.pdf"
+        documents[path] = rng.sample(VOCABULARY, rng.randint(1, 40))
+        if i % 3 == 0:
+            pages[path] = {term: sorted(rng.sample(range(1, 50), 3)) for term in documents[path]}
+    return documents, pages
+
+
+def _postings(index):
+    return {term: list(index.doc_ids(term)) for term in index.terms if len(index.doc_ids(term))}
+
+
+def _assert_same(index, expected):
+    assert len(index) == len(expected)
+    assert [index.path(i) for i in range(len(index))] == [
+        expected.path(i) for i in range(len(expected))
+    ]
+    assert _postings(index) == _postings(expected)
+    for doc_id in range(len(expected)):
+        assert index.term_pages(doc_id) == expected.term_pages(doc_id)
+        assert index.duplicates(doc_id) == expected.duplicates(doc_id)
+
+
+def test_spilled_runs_merge_into_the_in_memory_index(tmp_path):
+    documents, pages = _corpus()
+    duplicates = {"/docs/0/file0.pdf": ["/copies/file0.pdf"], "/missing.pdf": ["/x.pdf"]}
+
+    builder = ExternalIndexBuilder(tmp_path / "spill", 0.01)
+    for path, keywords in documents.items():
+        builder.add(path, keywords, pages.get(path))
+    index, kept = builder.finish(duplicates)
+
+    assert len(list((tmp_path / "spill").glob("run-*.tsv"))) > 1
+    assert kept == {"/docs/0/file0.pdf": ["/copies/file0.pdf"]}
+    _assert_same(index, CompactIndex.from_dict(documents, pages, kept))
+    for term in index.terms:
+        doc_ids = list(index.doc_ids(term))
+        assert doc_ids == sorted(doc_ids)
+
+    builder.clear()
+    assert not (tmp_path / "spill").exists()
+
+
+def test_streaming_loader_round_trip(tmp_path):
+    documents, pages = _corpus()
+    duplicates = {"/docs/3/file3.pdf": ["/copies/a.pdf", "/copies/b.pdf"]}
+    output_file = tmp_path / "index.json"
+
+    builder = ExternalIndexBuilder(tmp_path / "spill", 0.01)
+    for path, keywords in documents.items():
+        builder.add(path, keywords, pages.get(path))
+    _, kept = builder.finish(duplicates)
+    manifest = save_index_records(builder.documents(), output_file, kept)
+    builder.clear()
+
+    index = load_compact_index(output_file)
+    assert index.generation == manifest["generation"]
+    _assert_same(index, CompactIndex.from_dict(documents, pages, kept))
+
+
+def test_streaming_loader_falls_back_to_previous_generation(tmp_path):
+    output_file = tmp_path / "index.json"
+    save_index({"/docs/a.pdf": ["alpha"]}, output_file)
+    manifest = save_index({"/docs/b.pdf": ["beta"]}, output_file)
+
+    current = tmp_path / manifest["file"]
+    current.write_bytes(current.read_bytes().replace(b"beta", b"gamma"))
+
+    index = load_compact_index(output_file)
+    assert index.generation == manifest["generation"] - 1
+    assert list(index.doc_ids("alpha")) == [0]
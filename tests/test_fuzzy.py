@@ -0,0 +1,49 @@
+from core.compact_index import CompactIndex
+from core.fuzzy import FuzzyMatcher, edit_distance
+from core.search_engine import expand_terms
+
+
+def test_transposition_is_one_edit():
+    assert edit_distance("graident", "gradient", 2) == 1
+    assert edit_distance("gradient", "gradient", 1) == 0
+    assert edit_distance("gradint", "gradient", 1) == 1
+    assert edit_distance("gardeint", "gradient", 3) == 2
+
+
+def test_distance_is_cut_off_at_the_bound():
+    # The length difference alone exceeds the bound
+    assert edit_distance("net", "network", 2) == 3
+    # Every row of the table exceeds the bound early on
+    assert edit_distance("zzzzzz", "gradient", 2) == 3
+    assert edit_distance("zzzzzz", "gradient", 10) == 8
+
+
+def test_lookup_finds_terms_within_the_distance():
+    matcher = FuzzyMatcher(["gradient", "gradients", "network", "neural"], max_distance=1)
+    assert matcher.lookup("graident") == [("gradient", 1)]
+    assert matcher.lookup("gradient") == [("gradient", 0), ("gradients", 1)]
+    assert matcher.lookup("netwrk") == [("network", 1)]
+    assert matcher.lookup("nrtwrk") == []
+
+
+def test_lookup_ignores_short_words():
+    matcher = FuzzyMatcher(["cats", "cat", "ca"], max_distance=1, min_length=4)
+    assert matcher.lookup("cat") == []
+    assert matcher.lookup("cut") == []
+    # Terms down to min_length - max_distance chars can still be matched
+    assert matcher.lookup("catz") == [("cat", 1), ("cats", 1)]
+    assert matcher.lookup("caz") == []
+    assert FuzzyMatcher(["cats"], max_distance=0).lookup("catz") == []
+
+
+def test_expanded_terms_are_weighted_by_distance():
+    index = CompactIndex.from_dict(
+        {"/docs/a.txt": ["gradient", "network"], "/docs/b.txt": ["gradients"]}
+    )
+    assert expand_terms(["network"], index) == [[("network", 1.0)]]
+    assert expand_terms(["graident"], index, penalty=0.5) == [[("gradient", 0.5)]]
+    assert expand_terms(["grdient"], index, max_distance=2, penalty=0.5) == [
+        [("gradient", 0.5), ("gradients", 0.25)]
+    ]
+    assert expand_terms(["graident"], index, max_distance=0) == [[("graident", 1.0)]]
+    assert expand_terms(["xyzzy"], index) == [[]]
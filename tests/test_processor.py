@@ -0,0 +1,59 @@
+import json
+import os
+
+from core import processor
+from core.checkpoint import META_FILE, has_checkpoint
+from core.config import load_config
+from core.index_manager import save_index
+from core.processor import process_all_batches
+from core.text_store import TextStore
+
+
+def _batch(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("Neural networks learn representations.", encoding="utf-8")
+    (docs / "b.txt").write_text("Databases store indexed records.", encoding="utf-8")
+    batch = tmp_path / "part_1.txt"
+    batch.write_text(f"{docs / 'a.txt'}\n{docs / 'b.txt'}\n", encoding="utf-8")
+    return [str(batch)]
+
+
+def _fingerprint(checkpoint_dir):
+    return json.loads((checkpoint_dir / META_FILE).read_text(encoding="utf-8"))["fingerprint"]
+
+
+def test_normalizer_change_starts_a_fresh_run(tmp_path, monkeypatch):
+    batch_files = _batch(tmp_path)
+    checkpoint_dir = tmp_path / "checkpoints"
+    D, _, _ = process_all_batches(batch_files, 10, checkpoint_dir=checkpoint_dir)
+    assert len(D) == 2
+    porter = _fingerprint(checkpoint_dir)
+
+    cfg = {**load_config(), "STEMMER": "snowball"}
+    monkeypatch.setattr(processor, "load_config", lambda: cfg)
+    process_all_batches(batch_files, 10, checkpoint_dir=checkpoint_dir)
+    assert _fingerprint(checkpoint_dir) != porter
+
+
+def test_resume_after_publishing_moved_the_text_store(tmp_path):
+    batch_files = _batch(tmp_path)
+    checkpoint_dir = tmp_path / "checkpoints"
+    store_dir = str(tmp_path / "text_store")
+    output_file = tmp_path / "output.json"
+    D, pages, duplicates = process_all_batches(
+        batch_files, 10, text_store_dir=store_dir, checkpoint_dir=checkpoint_dir
+    )
+    # Crash between publishing (which moves the text store) and clearing
+    # the checkpoint
+    save_index(D, output_file, pages, duplicates, store_dir)
+    assert has_checkpoint(checkpoint_dir) and not os.path.exists(store_dir)
+
+    D, pages, duplicates = process_all_batches(
+        batch_files, 10, text_store_dir=store_dir, checkpoint_dir=checkpoint_dir
+    )
+    assert len(D) == 2
+    manifest = save_index(D, output_file, pages, duplicates, store_dir, checkpoint_dir)
+    assert not has_checkpoint(checkpoint_dir)
+    store = TextStore(output_file.with_name(manifest["text_store"]))
+    assert store.get(str(tmp_path / "docs" / "a.txt")).startswith("Neural networks")
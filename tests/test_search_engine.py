@@ -0,0 +1,78 @@
+import random
+
+from core import query_stats, search_engine
+from core.compact_index import CompactIndex
+from core.search_engine import rank_documents, search_page, search_results
+
+
+def _index(n):
+    return CompactIndex.from_dict({f"/docs/{i:03d}.txt": ["neural"] for i in range(n)})
+
+
+def _all_pages(index, limit):
+    pages, cursor = [], None
+    while True:
+        results, cursor, total = search_page("neural", index, limit=limit, cursor=cursor)
+        pages.append(results)
+        if cursor is None:
+            return pages, total
+
+
+def test_no_cursor_after_an_exactly_full_last_page():
+    pages, total = _all_pages(_index(10), limit=5)
+    assert total == 10
+    assert [len(page) for page in pages] == [5, 5]
+
+
+def test_pages_cover_every_match_once():
+    index = _index(12)
+    pages, total = _all_pages(index, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 2]
+    paths = [result.path for page in pages for result in page]
+    assert sorted(paths) == [index.path(i) for i in range(12)]
+
+
+def _scored_index(n=300, seed=3):
+    rng = random.Random(seed)
+    words = ["neural", "network", "train", "gradient", "optim"]
+    return CompactIndex.from_dict(
+        {f"/docs/{i:03d}.txt": rng.sample(words, rng.randint(1, 5)) for i in range(n)}
+    )
+
+
+def test_pages_past_the_cached_ranking_are_rescored(monkeypatch):
+    index = _scored_index()
+    expected = search_results("neural network train", index)
+    monkeypatch.setattr(search_engine, "CACHED_RESULTS", 25)
+    search_engine._score_caches.clear()
+
+    paths, cursor = [], None
+    while True:
+        results, cursor, total = search_page(
+            "neural network train", index, limit=20, cursor=cursor
+        )
+        paths += [result.path for result in results]
+        if cursor is None:
+            break
+    assert total == len(expected)
+    assert paths == [result.path for result in expected]
+
+
+def test_top_k_past_the_cached_ranking(monkeypatch):
+    index = _scored_index()
+    expected = search_results("gradient optim", index, top_k=100)
+    monkeypatch.setattr(search_engine, "CACHED_RESULTS", 10)
+    search_engine._score_caches.clear()
+    expanded = [[("gradient", 1.0)], [("optim", 1.0)]]
+    assert rank_documents(expanded, index, top_k=100) == expected
+    assert rank_documents(expanded, index, top_k=5) == expected[:5]
+
+
+def test_only_the_first_page_is_recorded_as_a_query(monkeypatch):
+    stats = query_stats.QueryStats()
+    monkeypatch.setattr(query_stats, "_default", stats)
+    index = _scored_index()
+    results, cursor, _ = search_page("neural network", index, limit=20)
+    while cursor is not None:
+        _, cursor, _ = search_page("neural network", index, limit=20, cursor=cursor)
+    assert [trace["query"] for trace in stats.traces()] == ["neural network"]
@@ -0,0 +1,75 @@
+import os
+import signal
+from collections import Counter
+
+from core.compact_index import CompactIndex
+from core.search_engine import search_results
+from core.sharding import ShardedSearcher
+
+
+def _index(n=120):
+    words = ["neural", "network", "train", "gradient"]
+    return CompactIndex.from_dict(
+        {f"/docs/{i:03d}.txt": words[: 1 + i % len(words)] for i in range(n)}
+    )
+
+
+def _scored(results):
+    return Counter((result.score, result.path) for result in results)
+
+
+def test_pages_merge_across_shards():
+    index = _index()
+    expected = search_results("neural network train", index)
+    searcher = ShardedSearcher(index, 2, reload=lambda: index)
+    try:
+        assert _scored(searcher.search_results("neural network train")) == _scored(expected)
+
+        results, cursor, pages = [], None, 0
+        while True:
+            page, cursor, total = searcher.search_page(
+                "neural network train", limit=7, cursor=cursor
+            )
+            results += page
+            pages += 1
+            if cursor is None:
+                break
+        assert total == len(expected) == len(results)
+        assert pages == -(-total // 7)
+        assert _scored(results) == _scored(expected)
+        scores = [result.score for result in results]
+        assert scores == sorted(scores, reverse=True)
+        assert searcher._shards
+    finally:
+        searcher.close()
+
+
+def test_hung_shard_falls_back_to_in_process_search():
+    index = _index()
+    expected = search_results("gradient", index)
+    reloads = []
+    searcher = ShardedSearcher(index, 2, reload=lambda: reloads.append(1) or index)
+    try:
+        searcher.search_results("gradient")  # wait until both shards answer
+        searcher.timeout = 0.5
+        process, _ = searcher._shards[0]
+        os.kill(process.pid, signal.SIGSTOP)
+        assert searcher.search_results("gradient") == expected
+        assert not searcher._shards
+        process.join(timeout=5)  # killed, not waited for
+        assert not process.is_alive()
+        assert searcher.search_page("gradient", limit=5)[2] == len(expected)
+        assert reloads == [1]
+    finally:
+        searcher.close()
+
+
+def test_shard_error_stops_the_shards():
+    index = _index()
+    searcher = ShardedSearcher(index, 2, reload=lambda: index)
+    try:
+        assert searcher._ask(("page", [[("neural", 1.0)]], None, "not a cursor", 5)) is None
+        assert not searcher._shards
+        assert searcher.search_results("neural") == search_results("neural", index)
+    finally:
+        searcher.close()
@@ -0,0 +1,82 @@
+import json
+
+from core.normalization import Normalizer
+from core.snippets import make_snippet
+from core.text_store import (
+    LOOKUP_KEYS, OFFSETS_SUFFIX, TextStore, TextStoreWriter, build_lookup, get_page
+)
+
+
+def _write_store(store_dir):
+    with TextStoreWriter(store_dir, "worker-0") as writer:
+        writer.add("/docs/a.pdf", "first page\fsecond page")
+        writer.add("/docs/b.txt", "plain text")
+        writer.add("/docs/moved.txt", "old copy")
+    with TextStoreWriter(store_dir, "worker-1") as writer:
+        writer.add("/docs/c.md", "# heading")
+        writer.add("/docs/moved.txt", "new copy")
+
+
+def test_lookup_round_trip(tmp_path):
+    _write_store(tmp_path)
+    build_lookup(tmp_path)
+    store = TextStore(tmp_path)
+    assert get_page(store.get("/docs/a.pdf"), 2) == "second page"
+    assert store.get("/docs/b.txt") == "plain text"
+    assert store.get("/docs/c.md") == "# heading"
+    # A path stored twice reads back its last copy
+    assert store.get("/docs/moved.txt") == "new copy"
+    assert "/docs/missing.pdf" not in store
+    assert store.get("/docs/missing.pdf") is None
+    assert len(store._keys) == 4
+
+
+def test_store_without_lookup_reads_offsets(tmp_path):
+    _write_store(tmp_path)
+    assert not (tmp_path / LOOKUP_KEYS).exists()
+    assert sorted(p.name for p in tmp_path.glob(f"*{OFFSETS_SUFFIX}")) == [
+        "worker-0.idx.json",
+        "worker-1.idx.json",
+    ]
+    store = TextStore(tmp_path)
+    assert store.get("/docs/a.pdf") == "first page\fsecond page"
+    assert store.get("/docs/c.md") == "# heading"
+    assert store._keys is None
+
+
+def test_corrupt_lookup_falls_back_to_offsets(tmp_path):
+    _write_store(tmp_path)
+    build_lookup(tmp_path)
+    (tmp_path / "lookup.shards.json").write_text("not json", encoding="utf-8")
+    assert TextStore(tmp_path).get("/docs/b.txt") == "plain text"
+
+
+def test_empty_store(tmp_path):
+    build_lookup(tmp_path)
+    assert json.loads((tmp_path / "lookup.shards.json").read_text(encoding="utf-8")) == []
+    assert TextStore(tmp_path).get("/docs/a.pdf") is None
+    assert TextStore(tmp_path / "missing").get("/docs/a.pdf") is None
+
+
+def test_snippet_escapes_html_around_matches():
+    normalizer = Normalizer(stemmer="porter")
+    text = "Tags like <b> & <i> are escaped; neural   networks are <b>bold</b>."
+    assert make_snippet(text, ["network"], normalizer) == (
+        "Tags like &lt;b&gt; &amp; &lt;i&gt; are escaped; neural "
+        "<b>networks</b> are &lt;b&gt;bold&lt;/b&gt;."
+    )
+    assert make_snippet("a < b", ["network"], normalizer) == "a &lt; b"
+
+
+def test_snippet_window_covers_the_densest_matches():
+    normalizer = Normalizer(stemmer="porter")
+    text = "network " + "filler " * 100 + "neural network training " + "filler " * 100
+    snippet = make_snippet(text, ["neural", "network", "train"], normalizer, max_chars=60)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "<b>neural</b> <b>network</b> <b>training</b>" in snippet
+    assert len(snippet.replace("<b>", "").replace("</b>", "")) <= 60 + 2
+
+
+def test_lookup_for_a_missing_store(tmp_path):
+    build_lookup(tmp_path / "gone")
+    assert TextStore(tmp_path / "gone").get("/docs/a.pdf") is None